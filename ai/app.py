@@ -2,11 +2,14 @@
 from flask import Flask, jsonify, render_template, request
 import pandas as pd
 
-from ai.bot_detection.main import aggregate_per_user, bot_probabilities
+from ai.bot_detection.main import aggregate_per_user, bot_probabilities, store_sweep_results, page_sweep_results, parse_page_param, DEFAULT_THRESHOLD, DEFAULT_TOP_N, MAX_SWEEP_PAGE_SIZE
 from ai.categorize_video.main import categorize_video_into_3_categories
-from ai.evaluate_video_quality.main import evaluate_video_quality, evaluate_video_quality_batch
+from ai.evaluate_video_quality.main import evaluate_video_quality, evaluate_video_quality_batch, analyze_video_by_id
 from ai.cluster_videos.main import cluster_videos_into_category
 from ai.visualize_clustering_algo.main import visualize_clustering_algo
+from ai.bot_content_detection.duplicate_graph import build_duplicate_graph
+from ai.tech_stack.faiss_algo import DUPLICATE_SIMILARITY_THRESHOLD
+from ai.tech_stack.job_queue import register_job, submit_job, get_job
 from flask_cors import CORS
 # Create an instance of the Flask class
 # __name__ is a special variable that gets the name of the current file
@@ -44,15 +47,85 @@ def about():
     """
     return render_template('about.html', title='About Us', content='This is the about page.')
 
+# ------------------------------------------
+# Background jobs for long-running admin operations
+# ------------------------------------------
+
+def cluster_videos_job(params, report_progress):
+    report_progress(0.0, "Clustering videos")
+    cluster_videos_into_category()
+
+    report_progress(0.8, "Projecting embeddings to 3D")
+    projected_embeddings = visualize_clustering_algo()
+
+    return {
+        "video_embeddings_3d": projected_embeddings[0],
+        "centroid_embeddings_3d": projected_embeddings[1]
+    }
+
+def evaluate_video_job(params, report_progress):
+    return {"quality_score": float(evaluate_video_quality(params["video_id"]))}
+
+def evaluate_video_batch_job(params, report_progress):
+    return evaluate_video_quality_batch(params["video_ids"], on_progress=report_progress)
+
+def duplicate_graph_job(params, report_progress):
+    return build_duplicate_graph(threshold=params["threshold"], on_progress=report_progress)
+
+register_job("cluster_videos", cluster_videos_job)
+register_job("evaluate_video", evaluate_video_job)
+register_job("evaluate_video_batch", evaluate_video_batch_job)
+register_job("duplicate_graph", duplicate_graph_job)
+
+def accepted_job_response(job_type, params):
+    job_id, created = submit_job(job_type, params)
+    return jsonify({
+        "job_id": job_id,
+        "status_url": f"/admin/jobs/{job_id}",
+        "coalesced": not created
+    }), 202
+
+@app.route('/admin/jobs/<job_id>', methods=['GET'])
+def job_status_endpoint(job_id):
+    """
+    JOB STATUS
+    Returns status, progress and (once finished) the result or error of a background job.
+    """
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job), 200
+
 # ------------------------------------------
 # Real Endpoints and Logic would go below
 # ------------------------------------------
 
+def format_bot_user_results(results_df):
+    # Split user_id, metadata, and probability
+    response_list = []
+    for _, row in results_df.iterrows():
+        user_id = row["user_id"]
+        prob = row["bot_probability"]
+
+        # Metadata: all other columns except user_id & bot_probability
+        metadata = row.drop(labels=["user_id", "bot_probability"]).to_dict()
+
+        response_list.append({
+            "user_id": user_id,
+            "metadata": metadata,
+            "bot_probability": prob
+        })
+
+    return response_list
+
 @app.route('/admin/run-bot-user-check', methods=['POST'])
 def run_bot_user_check_endpoint():
     """
     CHECK IF USERS ARE BOTS
     EXPECTS: JSON payload with 'events': list of event dicts
+    OPTIONAL: 'threshold' (default 0.5), 'top_n' (default 10, max 1000),
+              'store_results' (true to keep every suspicious user for paging via
+              /admin/bot-user-check/<sweep_id>; 'top_n' is then the first page size)
     """
     # Get JSON data from request
     data = request.get_json()
@@ -62,31 +135,59 @@ def run_bot_user_check_endpoint():
 
     events = data["events"]
 
+    try:
+        threshold = float(data.get("threshold", DEFAULT_THRESHOLD))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'threshold' must be a number"}), 400
+
+    # Validate before scoring, so a bad value never leaves an orphaned stored sweep behind
+    try:
+        top_n = parse_page_param("top_n", data.get("top_n"), DEFAULT_TOP_N, 1, MAX_SWEEP_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     # Convert list of events → DataFrame
     df = pd.DataFrame(events)
 
     # Aggregate per user
     user_features = aggregate_per_user(df)
 
+    if data.get("store_results"):
+        # Score the whole sweep once and return the first page with a cursor
+        sweep_id = store_sweep_results(user_features, threshold=threshold)
+        page, next_cursor, total = page_sweep_results(sweep_id, limit=top_n)
+        return jsonify({
+            "sweep_id": sweep_id,
+            "total": total,
+            "results": format_bot_user_results(page),
+            "next_cursor": next_cursor
+        })
+
     # Get bot probabilities
-    results_df = bot_probabilities(user_features)
+    results_df = bot_probabilities(user_features, threshold=threshold, top_n=top_n)
 
-    # Split user_id, metadata, and probability
-    response_list = []
-    for _, row in results_df.iterrows():
-        user_id = row["user_id"]
-        prob = row["bot_probability"]
+    return jsonify(format_bot_user_results(results_df))
 
-        # Metadata: all other columns except user_id & bot_probability
-        metadata = row.drop(labels=["user_id", "bot_probability"]).to_dict()
-
-        response_list.append({
-            "user_id": user_id,
-            "metadata": metadata,
-            "bot_probability": prob
-        })
+@app.route('/admin/bot-user-check/<sweep_id>', methods=['GET'])
+def page_bot_user_check_endpoint(sweep_id):
+    """
+    PAGE THROUGH A STORED BOT USER CHECK
+    EXPECTS: optional 'cursor' (from the previous page) and 'limit' (default 100, max 1000) query params
+    Stored sweeps expire after SWEEP_TTL_SECONDS (default 24h).
+    """
+    try:
+        page, next_cursor, total = page_sweep_results(sweep_id, cursor=request.args.get('cursor'), limit=request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
 
-    return jsonify(response_list)
+    return jsonify({
+        "sweep_id": sweep_id,
+        "total": total,
+        "results": format_bot_user_results(page),
+        "next_cursor": next_cursor
+    })
 
 @app.route('/admin/categorize-video', methods=['GET'])
 def categorize_videos_endpoint():
@@ -109,11 +210,15 @@ def evaluate_video_endpoint():
     """
     EVALUATE VIDEO QUALITY
     This endpoint triggers the video quality evaluation process.
+    With async=true it returns 202 and a job id to poll at /admin/jobs/<job_id>.
     """
     video_id = request.args.get('video_id')
     if not video_id:
         return jsonify({"quality_score": -1.0, "error": "Missing video_id"}), 400
 
+    if request.args.get('async', 'false').lower() == 'true':
+        return accepted_job_response("evaluate_video", {"video_id": video_id})
+
     try:
         quality_score = evaluate_video_quality(video_id)
         return jsonify({"quality_score": float(quality_score)})
@@ -121,23 +226,37 @@ def evaluate_video_endpoint():
         return jsonify({"quality_score": -1.0, "error": str(e)}), 500
     
 
+@app.route('/admin/analyze-video', methods=['GET'])
+def analyze_video_endpoint():
+    """
+    ANALYZE VIDEO
+    Quality score, category and bot-content indicators from one (cached) Gemini call.
+    """
+    video_id = request.args.get('video_id')
+    if not video_id:
+        return jsonify({"error": "Missing video_id"}), 400
+
+    try:
+        analysis = analyze_video_by_id(video_id)
+        if analysis is None:
+            return jsonify({"error": f"No S3 URL found for video ID: {video_id}"}), 404
+        return jsonify({
+            "quality_score": float(analysis['normalized_score']),
+            "category": analysis['category'],
+            "bot_indicators": analysis['bot_indicators']
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/admin/cluster-videos', methods=['GET'])
 def cluster_videos_endpoint():
     """
     CLUSTER VIDEOS
-    This endpoint triggers the video clustering process.
+    This endpoint queues the video clustering process.
+    Returns 202 and a job id to poll at /admin/jobs/<job_id>.
     """
     try:
-        cluster_videos_into_category()
-        
-        projected_embeddings = visualize_clustering_algo()
-        
-        response = {
-            "video_embeddings_3d": projected_embeddings[0],
-            "centroid_embeddings_3d": projected_embeddings[1]
-            
-        }
-        return jsonify(response), 200
+        return accepted_job_response("cluster_videos", {})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -145,17 +264,38 @@ def cluster_videos_endpoint():
 def evaluate_video_endpoint_batch():
     """
     EVALUATE VIDEO QUALITY BATCH
+    EXPECTS: 'video_ids' query param as a comma-separated list
+    Returns 202 and a job id to poll at /admin/jobs/<job_id>.
     """
     video_ids = request.args.get('video_ids')
     if not video_ids:
         return jsonify({"error": "Missing video_id"}), 400
 
+    video_ids = sorted({vid.strip() for vid in video_ids.split(',') if vid.strip()})
+
     try:
-        quality_scores = evaluate_video_quality_batch(video_ids)
-        return jsonify(quality_scores)
+        return accepted_job_response("evaluate_video_batch", {"video_ids": video_ids})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+@app.route('/admin/duplicate-graph', methods=['POST'])
+def duplicate_graph_endpoint():
+    """
+    DUPLICATE GRAPH
+    Queues a catalog-wide near-duplicate search that writes the similarity graph and candidate bot rings.
+    OPTIONAL: 'threshold' query param (cosine similarity, default 0.9)
+    Returns 202 and a job id to poll at /admin/jobs/<job_id>.
+    """
+    try:
+        threshold = float(request.args.get('threshold', DUPLICATE_SIMILARITY_THRESHOLD))
+    except ValueError:
+        return jsonify({"error": "threshold must be a number"}), 400
+
+    try:
+        return accepted_job_response("duplicate_graph", {"threshold": threshold})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/admin/visualize-clustering-algo', methods=['GET'])
 def visualize_clustering_algo_endpoint():
     """
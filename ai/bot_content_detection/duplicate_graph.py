@@ -0,0 +1,129 @@
+'''
+Catalog-wide near-duplicate graph and bot-ring candidates.
+
+Every video in the published catalog index is range-searched against the whole catalog in
+blocks of rows. FAISS parallelizes each block across cores, and only one block of results is
+held in memory at a time. Each pair at or above the similarity threshold becomes an edge,
+written once (src < dst) to edges.bin as packed (uint32 src, uint32 dst, float16 similarity)
+records, 10 bytes per edge.
+
+Connected components of the graph with at least MIN_RING_SIZE videos are reported as candidate
+bot rings in rings.jsonl, largest first. Each ring lists its edge density; a density of 1.0
+means every pair in the ring is a near duplicate (a clique).
+
+Run from the repo root, or queue it with POST /admin/duplicate-graph:
+    python -m ai.bot_content_detection.duplicate_graph --threshold 0.9
+'''
+import os
+import json
+import time
+import argparse
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from ai.tech_stack.faiss_algo import DUPLICATE_SIMILARITY_THRESHOLD
+from ai.tech_stack.faiss_index_store import get_video_index
+
+GRAPH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "duplicate_graphs")
+EDGE_DTYPE = np.dtype([("src", "<u4"), ("dst", "<u4"), ("similarity", "<f2")])
+BLOCK_SIZE = 4096
+MIN_RING_SIZE = 3
+SUMMARY_RINGS = 20
+
+def range_search_block(index, vectors, start, end, threshold):
+    queries = np.ascontiguousarray(vectors[start:end], dtype=np.float32)
+    # Inner-product range search returns every neighbor with similarity above the radius
+    lims, similarities, neighbors = index.range_search(queries, threshold - 1e-6)
+
+    src = np.repeat(np.arange(start, end, dtype=np.int64), np.diff(lims).astype(np.int64))  # lims is uint64
+    keep = neighbors > src  # each undirected edge once, no self loops
+
+    edges = np.empty(int(keep.sum()), dtype=EDGE_DTYPE)
+    edges["src"] = src[keep]
+    edges["dst"] = neighbors[keep]
+    edges["similarity"] = similarities[keep]
+    return edges
+
+def find_rings(edges, n_videos, video_ids, min_size=MIN_RING_SIZE):
+    """Group videos into connected components and describe those with at least min_size members."""
+    graph = coo_matrix((np.ones(len(edges), dtype=np.int8), (edges["src"], edges["dst"])), shape=(n_videos, n_videos))
+    _, labels = connected_components(graph, directed=False)
+
+    sizes = np.bincount(labels)
+    edge_labels = labels[edges["src"]]
+    edge_counts = np.bincount(edge_labels, minlength=len(sizes))
+    similarity_sums = np.bincount(edge_labels, weights=edges["similarity"].astype(np.float64), minlength=len(sizes))
+
+    rings = []
+    order = np.argsort(labels, kind="stable")
+    boundaries = np.concatenate([[0], np.cumsum(sizes)])
+    for component in np.flatnonzero(sizes >= min_size):
+        members = order[boundaries[component]:boundaries[component + 1]]
+        size = int(sizes[component])
+        rings.append({
+            "size": size,
+            "edges": int(edge_counts[component]),
+            "density": round(float(edge_counts[component]) / (size * (size - 1) / 2), 4),
+            "mean_similarity": round(float(similarity_sums[component] / edge_counts[component]), 4),
+            "video_ids": [str(video_ids[i]) for i in members],
+        })
+    rings.sort(key=lambda ring: (ring["size"], ring["density"]), reverse=True)
+    return rings
+
+# Function to build the near-duplicate graph of the published catalog and extract candidate bot rings
+def build_duplicate_graph(threshold=DUPLICATE_SIMILARITY_THRESHOLD, block_size=BLOCK_SIZE, output_dir=None, on_progress=None):
+    """
+    Returns:
+        dict: Summary with the output directory, edge and ring counts and the largest rings.
+    """
+    catalog = get_video_index()
+    n_videos = catalog.index.ntotal
+    video_ids = catalog.ids if catalog.ids is not None else np.arange(n_videos).astype(str)
+
+    output_dir = output_dir or os.path.join(GRAPH_DIR, time.strftime("%Y%m%dT%H%M%S"))
+    os.makedirs(output_dir, exist_ok=True)
+    edges_path = os.path.join(output_dir, "edges.bin")
+
+    start_time = time.perf_counter()
+    n_edges = 0
+    with open(edges_path, 'wb') as edges_file:
+        for start in range(0, n_videos, block_size):
+            end = min(start + block_size, n_videos)
+            edges = range_search_block(catalog.index, catalog.vectors, start, end, threshold)
+            edges.tofile(edges_file)
+            n_edges += len(edges)
+            print(f"Searched videos {end}/{n_videos}, {n_edges} edges so far")
+            if on_progress:
+                on_progress(0.9 * end / max(n_videos, 1), f"Searched {end}/{n_videos} videos")
+
+    edges = np.memmap(edges_path, dtype=EDGE_DTYPE, mode='r') if n_edges else np.empty(0, dtype=EDGE_DTYPE)
+    rings = find_rings(edges, n_videos, video_ids)
+
+    np.save(os.path.join(output_dir, "video_ids.npy"), np.asarray(video_ids))
+    with open(os.path.join(output_dir, "rings.jsonl"), 'w', encoding='utf-8') as f:
+        for ring in rings:
+            f.write(json.dumps(ring) + "\n")
+
+    summary = {
+        "output_dir": output_dir,
+        "catalog_version": catalog.version,
+        "threshold": threshold,
+        "n_videos": int(n_videos),
+        "n_edges": int(n_edges),
+        "edge_format": "edges.bin: little-endian records (uint32 src, uint32 dst, float16 similarity); src/dst index video_ids.npy",
+        "n_rings": len(rings),
+        "seconds": round(time.perf_counter() - start_time, 2),
+    }
+    with open(os.path.join(output_dir, "meta.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"Duplicate graph: {n_edges} edges, {len(rings)} candidate rings, written to {output_dir}")
+    return {**summary, "top_rings": rings[:SUMMARY_RINGS]}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the catalog near-duplicate graph and find bot rings")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_SIMILARITY_THRESHOLD)
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+    args = parser.parse_args()
+
+    build_duplicate_graph(args.threshold, args.block_size)
@@ -6,9 +6,11 @@ Then, the similarity between the video embeddings is calculated pairwise using f
 after that, the video embeddings are processed and classified to be flagged as potential bot-generated content.
 
 '''
-import faiss                   # make faiss available, and gpu can be enabled later
 import numpy as np
-from ai.tech_stack.qdrant import retrieve_single_from_qdrant, retrieve_all_from_qdrant, VIDEO_COLLECTION_NAME
+from ai.tech_stack.qdrant import retrieve_single_from_qdrant, normalize_vectors
+from ai.tech_stack.faiss_algo import build_ip_index, DUPLICATE_SIMILARITY_THRESHOLD
+from ai.tech_stack.faiss_index_store import get_video_index, get_segment_index
+from ai.tech_stack.vector_projection import get_projection, build_reduced_index, search_with_rerank
 
 print("MAKE SURE YOU ARE READING THE EMBEDDINGS CORRECTLY AND NOT RANDOM FAKE DATA")
 print('GIVE THE VIDEO EMBEDDINGS AND QUERY EMBEDDINGS AS FIRST AND SECOND COMMAND LINE ARGUMENTS')
@@ -19,36 +21,61 @@ print('GIVE THE VIDEO EMBEDDINGS AND QUERY EMBEDDINGS AS FIRST AND SECOND COMMAN
 #qembed = np.array(eval(qembed))
 ####
 
-video_embeddings = retrieve_all_from_qdrant(VIDEO_COLLECTION_NAME) # retrieve all video embeddings from qdrant
+#the catalog embeddings and their index are published by ai.tech_stack.faiss_index_store and memory-mapped,
+#so every worker shares one copy and picks up newly published versions automatically
 
-def detect_similar_videos(qembed, vidembed=video_embeddings, k=5):
-    #since we are going to use l2distance for similarity, the input needs to be l2 normalized
-    vidembed = vidembed / np.linalg.norm(vidembed, axis=1, keepdims=True)
+SEGMENT_SIMILARITY_THRESHOLD = DUPLICATE_SIMILARITY_THRESHOLD
+MIN_SEGMENT_VOTES = 2 # matching segments needed before a stored video counts as the source of an excerpt
+SEGMENT_K = 10
+
+reduced_index_cache = {} # (projection, catalog index version) -> reduced index, built once per pair
+
+def reduced_index_for(projection, vidembed, version=None):
+    if version is None:
+        return build_reduced_index(projection, vidembed)
+    key = (projection, version)
+    if key not in reduced_index_cache:
+        reduced_index_cache.clear() # a retrained projection or new catalog version replaces the old index
+        reduced_index_cache[key] = build_reduced_index(projection, vidembed)
+    return reduced_index_cache[key]
+
+def detect_similar_videos(qembed, vidembed=None, k=5):
+    #vidembed defaults to the published catalog; a given vidembed must be unit-normalized (qdrant snapshots are),
+    #so inner product is cosine similarity
+    index, version = None, None
+    if vidembed is None:
+        catalog = get_video_index()
+        vidembed, index, version = catalog.vectors, catalog.index, catalog.version
+
+    # with a trained projection, candidates come from the reduced index and are re-ranked on full vectors
+    projection = get_projection()
+    reduced_index = reduced_index_for(projection, vidembed, version) if projection is not None and len(vidembed) else None
 
     print(f"Received embeddings shape: {vidembed.shape}")
     print(f'number of videos: {vidembed.shape[0]}')
     #vidembed is the video embeddings array of preexisting video vector embeddings
 
     #now lets do some query
-    qembed = qembed.reshape(-1,2048) # reshape the query embedding to be 1 * 2048 dimensional numpy array
-    qembed = qembed / np.linalg.norm(qembed, axis=1, keepdims=True)
+    qembed = normalize_vectors(qembed.reshape(-1,2048)) # reshape the query embedding to be 1 * 2048 dimensional numpy array
 
     print(f"Received query embedding shape: {qembed.shape}")
 
     #we need to list out the k most similar videos for each video from query against the vidembed
 
-    index = faiss.IndexFlatL2(vidembed.shape[1])   # build the index with the dimension
-    print(index.is_trained)
-    index.add(vidembed)                  # add vectors to the index
-    print(index.ntotal)
-    dist, ind = index.search(qembed, k)     # (squared)l2distance, and  index for each query
+    if reduced_index is not None:
+        cossim, ind = search_with_rerank(reduced_index, projection, vidembed, qembed, k) # exact cosine similarity after re-ranking
+    else:
+        if index is None:
+            index = build_ip_index(vidembed)   # flat float32, or scalar-quantized in compact mode
+        print(index.is_trained)
+        print(index.ntotal)
+        cossim, ind = index.search(qembed, k)     # cosine similarity, and  index for each query
 
-    dist_threshold = 0.2
-    flagged_dist = np.where(dist <= dist_threshold, 1, 0) # set distances above the threshold to infinity
+    flagged_dist = np.where(cossim >= DUPLICATE_SIMILARITY_THRESHOLD, 1, 0) # flag pairs at or above the similarity threshold
 
     # Generate list of (vidembed vector, qembed vector, cosine similiarity) tuples for flagged pairs, sorted by cosine similiarity
     flagged_pairs = [
-        (vidembed[ind[iq, iv]], qembed[iq], 1 - 0.5 * dist[iq, iv])
+        (vidembed[ind[iq, iv]], qembed[iq], cossim[iq, iv])
         for iq in range(flagged_dist.shape[0])
         for iv in range(flagged_dist.shape[1])
         if flagged_dist[iq, iv] == 1
@@ -58,4 +85,79 @@ def detect_similar_videos(qembed, vidembed=video_embeddings, k=5):
     print("Flagged pairs (vidembed vector, qembed vector, cosine similarity):", flagged_pairs)
     print(f"No of flagged pairs: {len(flagged_pairs)}")
 
-    return flagged_pairs
\ No newline at end of file
+    return flagged_pairs
+
+def detect_similar_videos_batch(qembeds, recent_embeddings=None):
+    """
+    Decide duplicate flags for a batch of new videos in one vectorized pass.
+
+    Each video is compared with the published catalog (one top-1 search for the whole batch),
+    with recent_embeddings (videos stored earlier in the run that are not yet in the published
+    index) and with the videos before it in the same batch (one new-vs-new similarity matrix).
+
+    Returns:
+        np.ndarray: Per video, the best cosine similarity if it is at or above
+                    DUPLICATE_SIMILARITY_THRESHOLD, otherwise NaN.
+    """
+    qembeds = normalize_vectors(np.asarray(qembeds).reshape(-1,2048))
+    best = np.full(len(qembeds), -np.inf, dtype=np.float32)
+
+    catalog = get_video_index()
+    if catalog.index.ntotal:
+        cossim, _ = catalog.index.search(qembeds, 1)
+        best = np.maximum(best, cossim[:, 0])
+
+    if recent_embeddings is not None and len(recent_embeddings):
+        best = np.maximum(best, (qembeds @ np.asarray(recent_embeddings, dtype=np.float32).T).max(axis=1))
+
+    # new-vs-new: video j only counts as a copy of videos 0..j-1, so the first of a group is kept
+    batch_sim = qembeds @ qembeds.T
+    batch_sim[np.tril_indices(len(qembeds))] = -np.inf
+    best = np.maximum(best, batch_sim.max(axis=0))
+
+    print(f"Checked batch of {len(qembeds)} videos, {int((best >= DUPLICATE_SIMILARITY_THRESHOLD).sum())} flagged")
+    return np.where(best >= DUPLICATE_SIMILARITY_THRESHOLD, best, np.nan)
+
+def detect_similar_segments(segment_embeddings_list, k=SEGMENT_K):
+    """
+    Find stored videos that contain a copy of part of each new video, e.g. a re-uploaded excerpt.
+
+    The segments of all given videos are searched in one call against the segment index. Hits at
+    or above SEGMENT_SIMILARITY_THRESHOLD are aggregated per stored video: votes (how many of the new
+    video's segments match it) and the max similarity. A stored video matches with at least
+    min(MIN_SEGMENT_VOTES, number of new segments) votes, so a one-segment excerpt can still match.
+
+    Returns:
+        list: Per new video, the best match as (video_id, max similarity, votes), or None.
+    """
+    results = [None] * len(segment_embeddings_list)
+    segments = get_segment_index()
+    if not segment_embeddings_list or segments.index.ntotal == 0:
+        return results
+
+    counts = [len(segment_embeddings) for segment_embeddings in segment_embeddings_list]
+    queries = normalize_vectors(np.vstack([np.asarray(e).reshape(-1,2048) for e in segment_embeddings_list]))
+    cossim, ind = segments.index.search(queries, k) # one search for every segment of every video
+
+    boundaries = np.concatenate([[0], np.cumsum(counts)])
+    for i in range(len(segment_embeddings_list)):
+        hits = {} # stored video_id -> (votes, max similarity)
+        for row in range(boundaries[i], boundaries[i + 1]):
+            voted = set()
+            for similarity, j in zip(cossim[row], ind[row]):
+                if j < 0 or similarity < SEGMENT_SIMILARITY_THRESHOLD:
+                    break # results are sorted by similarity
+                video_id = str(segments.ids[j])
+                if video_id in voted:
+                    continue # one vote per new segment per stored video
+                voted.add(video_id)
+                votes, best = hits.get(video_id, (0, -np.inf))
+                hits[video_id] = (votes + 1, max(best, float(similarity)))
+
+        needed = min(MIN_SEGMENT_VOTES, counts[i])
+        matches = [(video_id, best, votes) for video_id, (votes, best) in hits.items() if votes >= needed]
+        if matches:
+            results[i] = max(matches, key=lambda match: (match[2], match[1]))
+
+    print(f"Segment search: {sum(r is not None for r in results)} of {len(results)} videos contain copied segments")
+    return results
@@ -0,0 +1,208 @@
+'''
+Perceptual-hash prefilter that catches obvious re-uploads before any paid embedding call.
+
+A video's fingerprint is a 64-bit dHash of each of FRAMES_PER_VIDEO keyframes sampled evenly
+across it. The frames are decoded locally with ffmpeg, which seeks over HTTP range requests so
+only a few small reads are needed. Stored fingerprints live in an append-only file and are
+indexed with FAISS multi-index hashing (IndexBinaryMultiHash): every frame hash within
+FRAME_HAMMING_RADIUS bits of a query frame is found without scanning the catalog.
+
+A new video is a re-upload of a stored video when at least MIN_MATCHING_FRAMES of its frames
+match frames of that video. Re-encoding, rescaling and small crops flip only a few bits of a
+dHash, so these are caught in milliseconds; anything else goes on to the embedding stage.
+
+The prefilter is enabled with PERCEPTUAL_HASH_PREFILTER=true and needs the ffmpeg and ffprobe
+binaries. Videos stored before it was enabled are fingerprinted from the repo root with:
+    python -m ai.bot_content_detection.perceptual_hash --backfill
+'''
+import os
+import fcntl
+import argparse
+import threading
+import faiss
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from ai.tech_stack.ffmpeg import probe_duration, extract_gray_frame, ffmpeg_available
+
+PERCEPTUAL_HASH_PREFILTER = os.getenv("PERCEPTUAL_HASH_PREFILTER", "false").lower() == "true"
+FINGERPRINT_DIR = os.getenv("FINGERPRINT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fingerprints"))
+FRAMES_PER_VIDEO = 8
+HASH_BITS = 64
+HASH_BYTES = HASH_BITS // 8
+RECORD_BYTES = FRAMES_PER_VIDEO * HASH_BYTES
+
+MULTI_HASH_TABLES = 8  # 8-bit sub-hashes: any frame within 7 bits shares one exactly
+FRAME_HAMMING_RADIUS = 6
+MIN_MATCHING_FRAMES = 6
+MIN_INFORMATIVE_FRAMES = 4
+MIN_FRAME_CONTRAST = 8  # flat frames (black, single color) hash to ~0 and would match each other
+BACKFILL_WORKERS = 8
+
+FFMPEG_MISSING = "ffmpeg and ffprobe were not found; install them or set FFMPEG_BIN / FFPROBE_BIN"
+if PERCEPTUAL_HASH_PREFILTER and not ffmpeg_available():
+    raise RuntimeError(f"PERCEPTUAL_HASH_PREFILTER is enabled but {FFMPEG_MISSING}")
+
+def dhash(pixels):
+    # Compare horizontally adjacent pixels of a 9x8 thumbnail: 8 rows x 8 comparisons = 64 bits
+    return np.packbits(pixels[:, 1:] > pixels[:, :-1])
+
+# Function to fingerprint a video (local path or URL) from its sampled keyframes
+def compute_video_fingerprint(source, n_frames=FRAMES_PER_VIDEO):
+    """
+    Returns:
+        tuple: (hashes, informative) - (n_frames, 8) uint8 frame hashes and a mask of frames
+               with enough contrast to be worth matching.
+    """
+    duration = probe_duration(source)
+    timestamps = [(i + 0.5) * duration / n_frames for i in range(n_frames)]
+    with ThreadPoolExecutor(max_workers=n_frames) as executor:
+        frames = list(executor.map(lambda t: extract_gray_frame(source, t, 9, 8), timestamps))
+
+    pixels = [np.frombuffer(frame, dtype=np.uint8).reshape(8, 9).astype(np.int16) for frame in frames]
+    hashes = np.stack([dhash(p) for p in pixels])
+    informative = np.array([np.ptp(p) >= MIN_FRAME_CONTRAST for p in pixels])
+    return hashes, informative
+
+class FingerprintIndex:
+    """Append-only fingerprint store shared by every process, with a per-process FAISS index over frame hashes."""
+    def __init__(self, directory=FINGERPRINT_DIR):
+        self.directory = directory
+        self.hashes_path = os.path.join(directory, "frame_hashes.bin")
+        self.ids_path = os.path.join(directory, "video_ids.txt")
+        self.index = faiss.IndexBinaryMultiHash(HASH_BITS, MULTI_HASH_TABLES, HASH_BITS // MULTI_HASH_TABLES)
+        self.video_ids = []
+        self.loaded_bytes = 0
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        # Index fingerprints appended (by any process) since the last refresh
+        size = os.path.getsize(self.hashes_path) if os.path.exists(self.hashes_path) else 0
+        size -= size % RECORD_BYTES  # ignore a record that is still being written
+        if size <= self.loaded_bytes:
+            return
+
+        # video ids are appended before their hashes, so every complete record has its id
+        with open(self.ids_path, 'r', encoding='utf-8') as f:
+            video_ids = [line.rstrip("\n") for line in f]
+        with open(self.hashes_path, 'rb') as f:
+            f.seek(self.loaded_bytes)
+            new_hashes = np.frombuffer(f.read(size - self.loaded_bytes), dtype=np.uint8).reshape(-1, HASH_BYTES)
+
+        self.index.add(new_hashes)
+        self.video_ids = video_ids[:size // RECORD_BYTES]
+        self.loaded_bytes = size
+
+    def find(self, fingerprint):
+        """
+        Returns:
+            tuple or None: (video_id, similarity, matching frames) of the best stored match, where
+                           similarity is 1 - mean Hamming distance / 64 over the matching frames.
+        """
+        hashes, informative = fingerprint
+        if informative.sum() < MIN_INFORMATIVE_FRAMES:
+            return None
+
+        with self.lock:
+            self.refresh()
+            if self.index.ntotal == 0:
+                return None
+            # Binary range search returns hashes strictly closer than the radius
+            lims, distances, labels = self.index.range_search(np.ascontiguousarray(hashes[informative]), FRAME_HAMMING_RADIUS + 1)
+            video_ids = self.video_ids
+
+        matches = {} # stored video row -> {query frame: best distance}
+        for query_frame in range(len(lims) - 1):
+            for distance, label in zip(distances[lims[query_frame]:lims[query_frame + 1]], labels[lims[query_frame]:lims[query_frame + 1]]):
+                frames = matches.setdefault(int(label) // FRAMES_PER_VIDEO, {})
+                frames[query_frame] = min(frames.get(query_frame, HASH_BITS), int(distance))
+
+        needed = min(MIN_MATCHING_FRAMES, int(informative.sum()))
+        best = None
+        for row, frames in matches.items():
+            if len(frames) < needed:
+                continue
+            similarity = 1 - np.mean(list(frames.values())) / HASH_BITS
+            if best is None or (len(frames), similarity) > (best[2], best[1]):
+                best = (video_ids[row], float(similarity), len(frames))
+        return best
+
+    def add(self, video_id, fingerprint):
+        hashes, _ = fingerprint
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "append.lock"), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)  # keep ids and hashes in the same order across processes
+            with open(self.ids_path, 'a', encoding='utf-8') as f:
+                f.write(video_id + "\n")
+            with open(self.hashes_path, 'ab') as f:
+                f.write(np.ascontiguousarray(hashes, dtype=np.uint8).tobytes())
+
+fingerprint_index = FingerprintIndex()
+
+# Function to fingerprint a video, returning None (so the caller falls back to embedding) if the
+# prefilter is disabled or decoding fails
+def try_fingerprint(source):
+    if not PERCEPTUAL_HASH_PREFILTER:
+        return None
+    try:
+        return compute_video_fingerprint(source)
+    except Exception as e:
+        print(f"Could not fingerprint {source}, skipping the perceptual-hash prefilter: {str(e)}")
+        return None
+
+# Function to find a stored video that this fingerprint is a re-upload of
+def find_reupload(fingerprint):
+    if fingerprint is None:
+        return None
+    return fingerprint_index.find(fingerprint)
+
+# Function to record the fingerprint of a stored video
+def add_fingerprint(video_id, fingerprint):
+    if fingerprint is not None:
+        fingerprint_index.add(video_id, fingerprint)
+
+# Function to fingerprint stored videos that have no fingerprint yet, e.g. the catalog from before the prefilter
+def backfill_fingerprints(workers=BACKFILL_WORKERS):
+    """
+    Returns:
+        dict: Count of videos fingerprinted, already fingerprinted and failed.
+    """
+    if not ffmpeg_available():
+        raise RuntimeError(FFMPEG_MISSING)
+    from ai.tech_stack.qdrant import retrieve_all_video_urls
+
+    with fingerprint_index.lock:
+        fingerprint_index.refresh()
+        done = set(fingerprint_index.video_ids)
+    video_urls = retrieve_all_video_urls()
+    pending = [(video_id, video_url) for video_id, video_url in video_urls if video_id not in done]
+    counts = {"fingerprinted": 0, "skipped": len(video_urls) - len(pending), "failed": 0}
+    print(f"Fingerprinting {len(pending)} stored videos ({counts['skipped']} already fingerprinted)")
+
+    def fingerprint(video_url):
+        try:
+            return compute_video_fingerprint(video_url)
+        except Exception as e:
+            print(f"Could not fingerprint {video_url}: {str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for (video_id, _), result in zip(pending, executor.map(fingerprint, [video_url for _, video_url in pending])):
+            if result is None:
+                counts["failed"] += 1
+                continue
+            fingerprint_index.add(video_id, result)
+            counts["fingerprinted"] += 1
+
+    print(f"Fingerprint backfill finished: {counts}")
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the perceptual-hash fingerprints of stored videos")
+    parser.add_argument("--backfill", action="store_true", help="fingerprint stored videos that have no fingerprint yet")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS, help="videos decoded concurrently")
+    args = parser.parse_args()
+
+    if args.backfill:
+        backfill_fingerprints(workers=args.workers)
+    else:
+        parser.print_help()
@@ -1,13 +1,109 @@
 import pandas as pd
 import numpy as np
+import io
+import os
+import time
+import uuid
+import hashlib
+import argparse
+import threading
 import joblib
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, confusion_matrix
+from ai.bot_detection.parallel_scoring import decision_function_sharded
+
+# Paths are resolved from this file so loading does not depend on the working directory
+BOT_DETECTION_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BOT_DETECTION_DIR, "models")
+SCALER_PATH = os.path.join(MODELS_DIR, "scaler.pkl")
+ISO_MODEL_PATH = os.path.join(MODELS_DIR, "isolation_forest_model.pkl")
+CALIBRATOR_PATH = os.path.join(MODELS_DIR, "score_calibrator.pkl")
+TRAIN_EVENTS_PATH = os.path.join(BOT_DETECTION_DIR, "clean_bot_dataset.csv")
+
+# Columns that are never model features
+NON_FEATURE_COLUMNS = ["user_id", "is_bot", "bot_type"]
+
+# Default filtering for bot checks
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_TOP_N = 10
+
+# Inverse regularization of the score calibration; effectively unregularized so the raw-score
+# separation (AUC ~0.97) is kept instead of being shrunk towards the base rate
+CALIBRATION_C = 1e6
+
+# Full results of large sweeps, paged through with page_sweep_results
+SWEEP_RESULTS_DIR = os.path.join(BOT_DETECTION_DIR, "sweeps")
+SWEEP_TTL_SECONDS = int(os.getenv("SWEEP_TTL_SECONDS", 24 * 3600))
+MAX_SWEEP_PAGE_SIZE = 1000
+
+# Batches at least this large are scored with the sharded process pool when n_jobs != 1; smaller
+# batches stay on sklearn's decision_function, which beats paying for a pool
+PARALLEL_SCORING_MIN_ROWS = 50_000
+# Processes that score a stored sweep (the large-sweep path); 0 uses every core, 1 disables the pool
+SWEEP_SCORING_JOBS = int(os.getenv("SWEEP_SCORING_JOBS", 0)) or None
 
 # ----------------------
-# Load model & scaler
+# Load model, scaler & calibrator (lazily, reloaded together when a file on disk changes)
 # ----------------------
-scaler = joblib.load("ai/bot_detection/models/scaler.pkl")
-iso_model = joblib.load("ai/bot_detection/models/isolation_forest_model.pkl")
+_loaded_artifacts = {}  # name -> (source mtimes, artifact)
+_artifact_lock = threading.RLock()
+
+def load_artifact(name, path, loader, depends_on=()):
+    """
+    Return the cached artifact for path, (re)loading it on first use or when the mtime of path
+    or of any file in depends_on changes.
+    """
+    mtimes = tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in (path, *depends_on))
+    with _artifact_lock:
+        cached = _loaded_artifacts.get(name)
+        if cached is None or cached[0] != mtimes:
+            print(f"Loading {name} from {path}...")
+            _loaded_artifacts[name] = (mtimes, loader(path))
+        return _loaded_artifacts[name][1]
+
+def read_iso_model(path=ISO_MODEL_PATH):
+    """Load the model and hash the same bytes, so the hash always describes the loaded model."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return joblib.load(io.BytesIO(data)), hashlib.sha1(data).hexdigest()
+
+class ScoringModels:
+    """A scaler and model with the calibrator that was fit for that model; always served together."""
+    def __init__(self, scaler, iso_model, calibrator):
+        self.scaler = scaler
+        self.iso_model = iso_model
+        self.calibrator = calibrator
+
+_serving_models = None  # last set whose calibrator matched its model
+
+def load_scoring_models(path=ISO_MODEL_PATH):
+    """
+    Load the model, scaler and calibrator from disk. If the calibrator does not match the model
+    (a retrained model whose calibrator has not been refit yet), the last matching set keeps
+    serving and the mismatch is logged; it only raises if no matching set was ever loaded.
+    """
+    global _serving_models
+    iso_model, model_sha1 = read_iso_model(path)
+    try:
+        calibrator = load_score_calibration(model_sha1)
+    except (FileNotFoundError, RuntimeError) as e:
+        if _serving_models is None:
+            raise
+        print(f"Warning: still serving the previous bot detection model: {str(e)}")
+        return _serving_models
+
+    _serving_models = ScoringModels(joblib.load(SCALER_PATH), iso_model, calibrator)
+    return _serving_models
+
+def get_scoring_models():
+    # Rechecked when any of the files changes; a new model goes live together with its calibrator
+    return load_artifact("scoring_models", ISO_MODEL_PATH, load_scoring_models, depends_on=(SCALER_PATH, CALIBRATOR_PATH))
+
+def preload_models():
+    """Load every artifact up front, e.g. in a server master process before forking workers."""
+    get_scoring_models()
 
 # ----------------------
 # Aggregation function (same as training)
@@ -46,60 +142,191 @@ def aggregate_per_user(df):
     return user_df
 
 # ----------------------
-# Bot probability function
+# Score calibration (fit once on the training distribution)
 # ----------------------
-def bot_probability(features_df):
-    """Return bot probability for each user in features_df."""
+def anomaly_scores(features_df, scaler, iso_model, n_jobs=1):
+    """
+    Return raw IsolationForest decision scores (higher = more normal).
+
+    With n_jobs != 1, batches of at least PARALLEL_SCORING_MIN_ROWS are split into chunks and
+    scored across a process pool, each worker calling the sklearn model; n_jobs=None uses every core.
+    """
     # Drop label and ID before scaling
-    X = features_df.drop(columns=["user_id"], errors="ignore")
+    X = features_df.drop(columns=NON_FEATURE_COLUMNS, errors="ignore")
 
     # Scale features
     X_scaled = scaler.transform(X)
 
-    # IsolationForest: higher scores = more normal, lower = anomalous
-    scores = iso_model.decision_function(X_scaled)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs == 1 or len(X_scaled) < PARALLEL_SCORING_MIN_ROWS:
+        return iso_model.decision_function(X_scaled)
+    return decision_function_sharded(X_scaled, iso_model, n_jobs=n_jobs)
 
-    # Normalize to [0,1] as probability of being a bot
-    prob = 1 - (scores - scores.min()) / (scores.max() - scores.min() + 1e-9)
+def fit_score_calibration(train_events_path=TRAIN_EVENTS_PATH, output_path=CALIBRATOR_PATH):
+    """
+    Fit a logistic mapping from IsolationForest decision scores to bot probability
+    on the labelled training events, and save it next to the model and scaler.
 
-    return prob
+    The mapping depends only on the training distribution, so a user's probability
+    no longer depends on who else is in the request batch. Scores are standardized first:
+    raw decision scores span ~0.3, which a regularized fit on the raw values barely separates.
+
+    Run after retraining the model: python -m ai.bot_detection.main --fit-calibration
+    Until then the server keeps serving the previous model with its calibrator.
+    """
+    # Fit for the model on disk, which may not be the one being served yet
+    iso_model, model_sha1 = read_iso_model()
+    train_users = aggregate_per_user(pd.read_csv(train_events_path))
+    scores = anomaly_scores(train_users, joblib.load(SCALER_PATH), iso_model).reshape(-1, 1)
+    labels = train_users["is_bot"].astype(int).values
+
+    calibrator = make_pipeline(StandardScaler(), LogisticRegression(C=CALIBRATION_C))
+    calibrator.fit(scores, labels)
+
+    # Saved with the hash of the model it was fit for, so a retrained model cannot reuse it
+    joblib.dump({"calibrator": calibrator, "model_sha1": model_sha1}, output_path)
+    print(f"Saved score calibrator to {output_path}")
+    return calibrator
+
+def load_score_calibration(model_sha1, path=CALIBRATOR_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No score calibrator at {path}; fit one with: python -m ai.bot_detection.main --fit-calibration")
+
+    saved = joblib.load(path)
+    if saved["model_sha1"] != model_sha1:
+        raise RuntimeError(f"Score calibrator at {path} was fit for a different {os.path.basename(ISO_MODEL_PATH)}; "
+                           "refit it with: python -m ai.bot_detection.main --fit-calibration")
+    return saved["calibrator"]
 
 # ----------------------
 # Bot probability function
 # ----------------------
-def bot_probabilities(user_df: pd.DataFrame) -> pd.DataFrame:
-    # Drop ID/label columns
-    X = user_df.drop(columns=["user_id"], errors="ignore")
+def bot_probability(features_df, n_jobs=1):
+    """Return calibrated bot probability for each user in features_df."""
+    # One consistent set for the whole batch, even if a reload happens meanwhile
+    models = get_scoring_models()
 
-    # Scale features
-    X_scaled = scaler.transform(X)
+    # IsolationForest: higher scores = more normal, lower = anomalous
+    scores = anomaly_scores(features_df, models.scaler, models.iso_model, n_jobs=n_jobs)
 
-    # IsolationForest scores
-    scores = iso_model.decision_function(X_scaled)
+    # Map scores to [0,1] probability of being a bot using the fixed calibration
+    prob = models.calibrator.predict_proba(scores.reshape(-1, 1))[:, 1]
 
-    # Normalize to [0,1] probability of being a bot
-    probs = 1 - (scores - scores.min()) / (scores.max() - scores.min() + 1e-9)
+    return prob
+
+# ----------------------
+# Bot probability function
+# ----------------------
+def bot_probabilities(user_df: pd.DataFrame, threshold=DEFAULT_THRESHOLD, top_n=DEFAULT_TOP_N, n_jobs=1) -> pd.DataFrame:
+    # Calibrated per-user probabilities, independent of batch composition
+    probs = bot_probability(user_df, n_jobs=n_jobs)
 
     # Add probability column
     user_df["bot_probability"] = probs
 
     # Filter suspicious users
-    suspicious = user_df[user_df["bot_probability"] > 0.5]
-
-    # Sort by probability (descending, most suspicious first)
-    suspicious = suspicious.sort_values("bot_probability", ascending=False)
+    suspicious = user_df[user_df["bot_probability"] > threshold]
 
-    # Limit to top 10
-    suspicious = suspicious.head(10)
+    # Keep the top N most suspicious users (partial selection, no full sort)
+    if top_n is None:
+        suspicious = suspicious.sort_values("bot_probability", ascending=False)
+    else:
+        suspicious = suspicious.nlargest(top_n, "bot_probability")
 
     return suspicious.reset_index(drop=True)
 
+# ----------------------
+# Stored sweep results (score once, page many times)
+# ----------------------
+def store_sweep_results(user_df: pd.DataFrame, threshold=DEFAULT_THRESHOLD, n_jobs=SWEEP_SCORING_JOBS):
+    """
+    Score every user once and persist all suspicious users, most suspicious first.
+    Sweeps of at least PARALLEL_SCORING_MIN_ROWS users are scored across n_jobs processes.
+
+    Returns:
+        str: sweep id to pass to page_sweep_results.
+    """
+    suspicious = bot_probabilities(user_df, threshold=threshold, top_n=None, n_jobs=n_jobs)
+
+    os.makedirs(SWEEP_RESULTS_DIR, exist_ok=True)
+    prune_sweep_results()
+    sweep_id = uuid.uuid4().hex
+    suspicious.to_pickle(os.path.join(SWEEP_RESULTS_DIR, f"{sweep_id}.pkl"))
+    print(f"Stored {len(suspicious)} suspicious users for sweep {sweep_id}")
+
+    return sweep_id
+
+def prune_sweep_results(ttl_seconds=SWEEP_TTL_SECONDS):
+    """Delete stored sweeps older than ttl_seconds."""
+    cutoff = time.time() - ttl_seconds
+    for filename in os.listdir(SWEEP_RESULTS_DIR):
+        path = os.path.join(SWEEP_RESULTS_DIR, filename)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            pass  # pruned concurrently by another worker
+
+def parse_page_param(name, value, default, minimum, maximum=None):
+    if value is None or value == "":
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be an integer")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ValueError(f"'{name}' must be between {minimum} and {maximum}" if maximum is not None else f"'{name}' must be at least {minimum}")
+    return value
+
+def page_sweep_results(sweep_id, cursor=None, limit=100):
+    """
+    Return one page of a stored sweep.
+
+    Args:
+        sweep_id (str): Id returned by store_sweep_results
+        cursor (str): Opaque cursor from the previous page, None for the first page
+        limit (int or str): Maximum number of users per page, 1 to MAX_SWEEP_PAGE_SIZE
+
+    Raises:
+        ValueError: If the sweep id, cursor or limit is invalid
+        KeyError: If the sweep does not exist or has expired
+
+    Returns:
+        tuple: (DataFrame page, next cursor or None when exhausted, total suspicious users)
+    """
+    # Sweep ids are generated by us; reject anything that could escape the results dir
+    if not sweep_id.isalnum():
+        raise ValueError(f"Invalid sweep id: {sweep_id}")
+
+    start = parse_page_param("cursor", cursor, 0, 0)
+    limit = parse_page_param("limit", limit, 100, 1, MAX_SWEEP_PAGE_SIZE)
+
+    path = os.path.join(SWEEP_RESULTS_DIR, f"{sweep_id}.pkl")
+    if not os.path.exists(path) or os.path.getmtime(path) < time.time() - SWEEP_TTL_SECONDS:
+        raise KeyError(f"Sweep {sweep_id} not found or expired")
+
+    suspicious = pd.read_pickle(path)
+    end = start + limit
+
+    page = suspicious.iloc[start:end].reset_index(drop=True)
+    next_cursor = str(end) if end < len(suspicious) else None
+
+    return page, next_cursor, len(suspicious)
+
 # ----------------------
 # Main evaluation
 # ----------------------
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate bot detection on the labelled test events")
+    parser.add_argument("--fit-calibration", action="store_true", help=f"refit the score calibrator on {TRAIN_EVENTS_PATH} first")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.fit_calibration:
+        fit_score_calibration()
+
     # Load raw test events
-    test_df = pd.read_csv("datasets/test_skibidi.csv")
+    test_df = pd.read_csv(os.path.join(BOT_DETECTION_DIR, "datasets", "test_skibidi.csv"))
 
     # Aggregate per user
     test_users = aggregate_per_user(test_df)
@@ -107,8 +334,8 @@ if __name__ == "__main__":
     # Compute probabilities
     probs = bot_probability(test_users)
 
-    # Convert to binary prediction (threshold = 0.5 by default)
-    y_pred = (probs >= 0.6).astype(int)
+    # Convert to binary prediction (same rule as bot_probabilities)
+    y_pred = (probs > args.threshold).astype(int)
     y_true = test_users["is_bot"].values
 
     # Evaluate
@@ -121,5 +348,5 @@ if __name__ == "__main__":
     results = test_users[["user_id", "is_bot"]].copy()
     results["bot_probability"] = probs
     results["prediction"] = y_pred
-    results.to_csv("test_predictions.csv", index=False)
+    results.to_csv(os.path.join(BOT_DETECTION_DIR, "test_predictions.csv"), index=False)
     print("\n✅ Results saved to test_predictions.csv")
@@ -0,0 +1,124 @@
+'''
+Sharded scoring for the IsolationForest bot detection model.
+
+The feature matrix is split into chunks that are scored in a process pool. The matrix is placed
+in shared memory and each worker receives the sklearn model once, so chunks are scored by sklearn's
+compiled tree walk on every core. store_sweep_results uses this path for sweeps of at least
+PARALLEL_SCORING_MIN_ROWS users (see SWEEP_SCORING_JOBS); smaller batches call
+iso_model.decision_function directly.
+
+Run `python -m ai.bot_detection.parallel_scoring` from the repo root to benchmark the sharded
+path against the sklearn baseline.
+'''
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+DEFAULT_CHUNK_SIZE = 20_000
+
+# ----------------------
+# Shared memory helpers
+# ----------------------
+def _to_shared(arrays):
+    """Copy a dict of arrays into one SharedMemory block and return (block, layout)."""
+    layout = {}
+    total = 0
+    for name, arr in arrays.items():
+        layout[name] = (total, arr.dtype.str, arr.shape)
+        total += (arr.nbytes + 7) // 8 * 8  # keep every array 8-byte aligned
+    block = shared_memory.SharedMemory(create=True, size=max(total, 1))
+    for name, arr in arrays.items():
+        offset, dtype, shape = layout[name]
+        np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)[...] = arr
+    return block, layout
+
+def _from_shared(block, layout):
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+        for name, (offset, dtype, shape) in layout.items()
+    }
+
+# Per-worker state, set once by the pool initializer
+_worker_block = None
+_worker_arrays = None
+_worker_model = None
+
+def _init_worker(block_name, layout, iso_model):
+    global _worker_block, _worker_arrays, _worker_model
+    _worker_block = shared_memory.SharedMemory(name=block_name)
+    _worker_arrays = _from_shared(_worker_block, layout)
+    _worker_model = iso_model
+
+def _score_chunk(start, end):
+    return start, _worker_model.decision_function(_worker_arrays["X"][start:end])
+
+# ----------------------
+# Sharded inference
+# ----------------------
+def decision_function_sharded(X_scaled, iso_model, n_jobs=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Score X_scaled in a process pool, one chunk of rows per task.
+
+    Each worker gets iso_model once (the caller's model, not whatever is on disk now) and calls
+    decision_function on its chunks. The feature matrix lives in shared memory for the pool's lifetime.
+    """
+    X_scaled = np.ascontiguousarray(X_scaled, dtype=np.float32)
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    block, layout = _to_shared({"X": X_scaled})
+
+    scores = np.empty(X_scaled.shape[0], dtype=np.float64)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_init_worker,
+            initargs=(block.name, layout, iso_model),
+        ) as executor:
+            futures = [
+                executor.submit(_score_chunk, start, min(start + chunk_size, X_scaled.shape[0]))
+                for start in range(0, X_scaled.shape[0], chunk_size)
+            ]
+            for future in futures:
+                start, chunk_scores = future.result()
+                scores[start:start + len(chunk_scores)] = chunk_scores
+    finally:
+        block.close()
+        block.unlink()
+
+    return scores
+
+# ----------------------
+# Benchmark
+# ----------------------
+def benchmark_scoring(iso_model, n_users=200_000, n_jobs=None, seed=0):
+    """Time sklearn and sharded sklearn scoring on synthetic standardized features."""
+    rng = np.random.default_rng(seed)
+    X_scaled = rng.standard_normal((n_users, iso_model.n_features_in_)).astype(np.float32)
+
+    start = time.perf_counter()
+    baseline = iso_model.decision_function(X_scaled)
+    sklearn_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sharded = decision_function_sharded(X_scaled, iso_model, n_jobs=n_jobs)
+    sharded_time = time.perf_counter() - start
+
+    results = {
+        "n_users": n_users,
+        "n_jobs": n_jobs or os.cpu_count() or 1,
+        "sklearn_s": sklearn_time,
+        "sklearn_sharded_s": sharded_time,
+        "max_abs_diff_sharded": float(np.max(np.abs(sharded - baseline))),
+    }
+
+    print(f"Scored {n_users} users:")
+    print(f"  sklearn decision_function : {sklearn_time:.3f}s")
+    print(f"  sklearn + sharded ({results['n_jobs']} jobs): {sharded_time:.3f}s ({sklearn_time / sharded_time:.1f}x)")
+    print(f"  max |diff| vs sklearn     : {results['max_abs_diff_sharded']:.2e}")
+    return results
+
+if __name__ == "__main__":
+    from ai.bot_detection.main import get_scoring_models
+    benchmark_scoring(get_scoring_models().iso_model)
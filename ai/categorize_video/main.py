@@ -1,19 +1,23 @@
-from ai.tech_stack.qdrant import retrieve_all_from_qdrant, CENTROID_COLLECTION_NAME, retrieve_video_embedding_by_id, retrieve_category_by_embedding
+from ai.tech_stack.qdrant import retrieve_video_embedding_by_id, retrieve_category_by_embedding
 from ai.tech_stack.faiss_algo import categorize_video
+from ai.tech_stack.single_flight import single_flight
+from ai.tech_stack.faiss_index_store import get_centroid_index
 
+@single_flight  # concurrent requests for the same video_id share one computation
 def categorize_video_into_3_categories(video_id):
     video_embedding = retrieve_video_embedding_by_id(video_id)
-    centroid_embeddings = retrieve_all_from_qdrant(CENTROID_COLLECTION_NAME)
+    centroids = get_centroid_index() # memory-mapped, published after each clustering run
+    centroid_embeddings = centroids.vectors
     
     if video_embedding is None:
         print(f"Video ID {video_id} not found.")
         return
     
-    if centroid_embeddings is None:
+    if centroid_embeddings is None or len(centroid_embeddings) == 0:
         print("No centroids found.")
         return
 
-    category_embeddings_and_similarity_scores = categorize_video(video_embedding, centroid_embeddings)
+    category_embeddings_and_similarity_scores = categorize_video(video_embedding, centroid_embeddings, centroid_index=centroids.index)
     
     total_score = sum(float(score) for _, score in category_embeddings_and_similarity_scores)
     
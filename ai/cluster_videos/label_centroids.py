@@ -1,9 +1,13 @@
 from ai.tech_stack.qdrant import retrieve_video_url_by_embedding, store_category_in_qdrant
 from ai.tech_stack.twelve_labs import categorize_video
+from ai.evaluate_video_quality.combined_analysis import analyze_video, GEMINI_COMBINED_ANALYSIS
 
 def label_centroids(centroid_categories):
     for centroid_embedding, nearest_video_embedding in centroid_categories:
         video_url = retrieve_video_url_by_embedding(nearest_video_embedding)
-        category = categorize_video(video_url)
+        if GEMINI_COMBINED_ANALYSIS:
+            category = analyze_video(video_url)['category']  # cached, shared with quality scoring
+        else:
+            category = categorize_video(video_url)
         store_category_in_qdrant(centroid_embedding, category)
         print(f"Labeled centroid with category: {category}")
\ No newline at end of file
@@ -1,6 +1,7 @@
 from ai.tech_stack.qdrant import retrieve_all_from_qdrant, VIDEO_COLLECTION_NAME, CENTROID_COLLECTION_NAME, delete_all_vectors
 from ai.tech_stack.faiss_algo import cluster_videos
 from ai.cluster_videos.label_centroids import label_centroids
+from ai.tech_stack.faiss_index_store import rebuild_index, CENTROID_INDEX
 
 def cluster_videos_into_category():
     # Retrieve all video embeddings from Qdrant
@@ -20,6 +21,9 @@ def cluster_videos_into_category():
     
     # Label centroids with categories and store in Qdrant
     label_centroids(centroid_categories)
+
+    # Publish the new centroids so every server worker swaps to them
+    rebuild_index(CENTROID_INDEX)
     
     # Visualize the clustering result
     
@@ -1,73 +1,294 @@
-from ai.tech_stack.twelve_labs import create_video_embedding
-from ai.tech_stack.qdrant import store_video_in_qdrant, retrieve_all_video_ids
-from ai.bot_content_detection.main import detect_similar_videos
-from ai.send_requests_to_java_server.flag_creator_bots import flag_creator_bots
-from ai.scripts.parse_video_ids_and_s3_urls import parse_video_url_map
+import os
+import json
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from ai.tech_stack.twelve_labs import create_video_embedding, create_video_and_segment_embeddings
+from ai.tech_stack.qdrant import store_video_in_qdrant, store_segments_in_qdrant, retrieve_all_video_ids, normalize_vectors, VECTOR_SIZE
+from ai.tech_stack.faiss_index_store import append_to_index, VIDEO_INDEX, SEGMENT_INDEX
+from ai.bot_content_detection.main import detect_similar_videos, detect_similar_videos_batch, detect_similar_segments
+from ai.bot_content_detection.perceptual_hash import try_fingerprint, find_reupload, add_fingerprint
+from ai.send_requests_to_java_server.outbox import enqueue_creator_bot_flag
+from ai.scripts.parse_video_ids_and_s3_urls import iter_video_url_map
+
+# Append-only record of every video's outcome in bulk runs; the last line per video wins
+CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "embed_checkpoint.jsonl")
+
+EMBEDDED = "embedded"
+FLAGGED = "flagged"
+FAILED = "failed"
+
+EMBED_BATCH_SIZE = 32
+EMBED_WORKERS = 4  # concurrent Twelve Labs embedding calls within a batch
+
+# Function to add just-stored videos to the published FAISS indexes, so the next duplicate check sees them
+def add_to_search_indexes(stored):
+    """
+    stored: list of (video_id, video_embedding, segment_embeddings) that are already in Qdrant.
+    A failure is only logged: the videos are stored and the next index rebuild includes them.
+
+    Returns:
+        bool: False if the indexes could not be updated.
+    """
+    if not stored:
+        return True
+    try:
+        append_to_index(
+            VIDEO_INDEX,
+            normalize_vectors(np.vstack([np.asarray(video_embedding).reshape(1, -1) for _, video_embedding, _ in stored])),
+            [video_id for video_id, _, _ in stored]
+        )
+        segments = [normalize_vectors(np.asarray(segment_embeddings).reshape(-1, VECTOR_SIZE)) for _, _, segment_embeddings in stored]
+        append_to_index(
+            SEGMENT_INDEX,
+            np.vstack(segments),
+            [video_id for (video_id, _, _), rows in zip(stored, segments) for _ in range(len(rows))]
+        )
+    except Exception as e:
+        print(f"Could not add {len(stored)} stored videos to the search indexes: {str(e)}")
+        return False
+    return True
 
 # Function to embed a single video file
 def embed_single_video(video_id, s3_url):
+    """
+    Embed a video and store it, or flag it if it duplicates an existing video or copies
+    segments of one (e.g. a re-uploaded excerpt).
+
+    Returns:
+        float or None: The similarity score (0-100) if the video was flagged, otherwise None.
+    """
     print(f"\nProcessing {video_id}...")
-    
-    # Generate video embeddings using Twelve Labs
-    video_embedding = create_video_embedding(s3_url)
-    
+
+    # Re-uploads of a stored video are caught from a few decoded frames, without paying for an embedding
+    fingerprint = try_fingerprint(s3_url)
+    reupload = find_reupload(fingerprint)
+    if reupload:
+        similarity_score = round(reupload[1] * 100, 2)
+        enqueue_creator_bot_flag(video_id, similarity_score)
+        print(f"Video {video_id} flagged as a re-upload of {reupload[0]} ({reupload[2]} matching frames, similarity {similarity_score}).")
+        return similarity_score
+
+    # Generate whole-video and segment embeddings using Twelve Labs (one embedding task)
+    video_embedding, segment_embeddings, segment_offsets = create_video_and_segment_embeddings(s3_url)
+
     # Run the bot content detection
     similar_videos = detect_similar_videos(video_embedding)
-    
     if not similar_videos:
-        # Store video embeddings in Qdrant
+        segment_match = detect_similar_segments([segment_embeddings])[0]
+        if segment_match:
+            print(f"Segments of {video_id} match {segment_match[2]} segments of {segment_match[0]}")
+            similar_videos = [(None, None, segment_match[1])]
+
+    if not similar_videos:
+        # Store video and segment embeddings in Qdrant
         store_video_in_qdrant(video_embedding, video_id, s3_url)
-        
+        store_segments_in_qdrant(segment_embeddings, segment_offsets, video_id, s3_url)
+        add_fingerprint(video_id, fingerprint)
+        add_to_search_indexes([(video_id, video_embedding, segment_embeddings)])
+
         print(f"Successfully processed {video_id}")
+        return None
     else:
         # Handle flagged content (i.e., notify via API)
         similarity_score = round(float(similar_videos[0][2]) * 100, 2)
         print(f"Similarity score: {similarity_score}, Type: {type(similarity_score)}")
-        flag_creator_bots(video_id, similarity_score)
-        
+        enqueue_creator_bot_flag(video_id, similarity_score)  # delivered by the outbox dispatcher
+
         print(f"Video {video_id} flagged as potential bot-generated content due to similarity with existing videos.")
-        
+        return similarity_score
+
 # Function to reembed single video file
 def reembed_single_video(video_id, s3_url):# Generate video embeddings using Twelve Labs
     video_embedding = create_video_embedding(s3_url)
-    
+
     # Store video embeddings in Qdrant
     store_video_in_qdrant(video_embedding, video_id, s3_url)
-    
+
     print(f"Successfully re-embedded {video_id}")
 
-# Function to embed videos from the S3 bucket
-def embed_videos(video_ids_and_urls):
-    all_video_ids = retrieve_all_video_ids()
-    for video_id, s3_url in video_ids_and_urls:
+# Function to load the latest recorded state of every video in a checkpoint file
+def load_checkpoint(checkpoint_path=CHECKPOINT_PATH):
+    states = {}
+    if not os.path.exists(checkpoint_path):
+        return states
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a partially written last line from an interrupted run
+            states[record["video_id"]] = record
+    return states
+
+def record_state(checkpoint_file, video_id, state, **details):
+    record = {"video_id": video_id, "state": state, "at": datetime.now(timezone.utc).isoformat(), **details}
+    checkpoint_file.write(json.dumps(record) + "\n")
+    checkpoint_file.flush()
+    os.fsync(checkpoint_file.fileno())
+
+# Function to embed a batch of videos and decide all their flags in one vectorized pass
+def embed_batch(batch, checkpoint_file, counts, unpublished):
+    """
+    Embed a batch of (video_id, s3_url) pairs, flag duplicates and store the rest.
+
+    Videos whose perceptual-hash fingerprint matches a stored video are flagged as re-uploads
+    first and never embedded. Duplicates are checked against the published catalog and within the
+    batch, so two copies submitted together are caught. Videos that pass are then checked at
+    segment level for copied excerpts in one segment search. Stored videos are appended to the
+    published video and segment indexes once per batch, so later batches find them there.
+
+    unpublished holds (video_id, video_embedding, segment_embeddings) of videos stored by earlier
+    batches whose index append failed; the append is retried each batch and until it succeeds
+    they are compared directly. It is empty unless publishing fails, so memory stays constant.
+    If the duplicate check itself fails, the videos embedded in this batch are recorded as
+    failed and the run moves on to the next batch.
+    """
+    with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as executor:
+        fingerprints = list(executor.map(try_fingerprint, [s3_url for _, s3_url in batch]))
+
+    to_embed = []
+    for (video_id, s3_url), fingerprint in zip(batch, fingerprints):
         try:
-            print(f"\nProcessing {video_id}...")
-            
-            if video_id in all_video_ids:
-                continue
-            
-            # Generate video embeddings using Twelve Labs
-            video_embedding = create_video_embedding(s3_url)
-            
-            # Run the bot content detection
-            similar_videos = detect_similar_videos(video_embedding)
-            
-            if not similar_videos:
-                # Store video embeddings in Qdrant
+            reupload = find_reupload(fingerprint)
+            if reupload:
+                similarity_score = round(reupload[1] * 100, 2)
+                enqueue_creator_bot_flag(video_id, similarity_score)
+                print(f"Video {video_id} flagged as a re-upload of {reupload[0]} (similarity {similarity_score}).")
+                record_state(checkpoint_file, video_id, FLAGGED, similarity_score=similarity_score)
+                counts[FLAGGED] += 1
+            else:
+                to_embed.append((video_id, s3_url, fingerprint))
+        except Exception as e:
+            print(f"Error processing {video_id}: {str(e)}")
+            record_state(checkpoint_file, video_id, FAILED, error=str(e))
+            counts[FAILED] += 1
+
+    with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as executor:
+        futures = [executor.submit(create_video_and_segment_embeddings, s3_url) for _, s3_url, _ in to_embed]
+
+    embedded = []
+    for (video_id, s3_url, fingerprint), future in zip(to_embed, futures):
+        try:
+            embedded.append((video_id, s3_url, fingerprint, future.result()))
+        except Exception as e:
+            print(f"Error processing {video_id}: {str(e)}")
+            record_state(checkpoint_file, video_id, FAILED, error=str(e))
+            counts[FAILED] += 1
+    if not embedded:
+        return
+
+    if unpublished and add_to_search_indexes(unpublished):
+        unpublished.clear()
+
+    try:
+        similarities = detect_similar_videos_batch(
+            [video_embedding for _, _, _, (video_embedding, _, _) in embedded],
+            recent_embeddings=normalize_vectors(np.vstack([np.asarray(video_embedding).reshape(1, -1) for _, video_embedding, _ in unpublished])) if unpublished else None
+        )
+
+        # Segment-level check for the videos that are not whole-video duplicates
+        unflagged = np.flatnonzero(np.isnan(similarities))
+        segment_matches = detect_similar_segments([embedded[i][3][1] for i in unflagged])
+        for i, segment_match in zip(unflagged, segment_matches):
+            if segment_match:
+                similarities[i] = segment_match[1]
+    except Exception as e:
+        # Without a duplicate check none of the batch can be stored; record it so --retry-failed picks it up
+        print(f"Duplicate check failed for a batch of {len(embedded)} videos: {str(e)}")
+        for video_id, _, _, _ in embedded:
+            record_state(checkpoint_file, video_id, FAILED, error=str(e))
+            counts[FAILED] += 1
+        return
+
+    stored = []
+    for (video_id, s3_url, fingerprint, (video_embedding, segment_embeddings, segment_offsets)), similarity in zip(embedded, similarities):
+        try:
+            if np.isnan(similarity):
                 store_video_in_qdrant(video_embedding, video_id, s3_url)
-                
-                print(f"Successfully processed {video_id}")
+                store_segments_in_qdrant(segment_embeddings, segment_offsets, video_id, s3_url)
+                stored.append((video_id, video_embedding, segment_embeddings))
+                add_fingerprint(video_id, fingerprint)
+                record_state(checkpoint_file, video_id, EMBEDDED)
+                counts[EMBEDDED] += 1
             else:
-                # Handle flagged content (i.e., notify via API)
-                similarity_score = round(float(similar_videos[0][2]) * 100, 2)
-                print(f"Similarity score: {similarity_score}, Type: {type(similarity_score)}")
-                # flag_creator_bots(video_id, similarity_score)
-        
-                print(f"Video {video_id} flagged as potential bot-generated content due to similarity with existing videos.")
+                similarity_score = round(float(similarity) * 100, 2)
+                enqueue_creator_bot_flag(video_id, similarity_score)
+                print(f"Video {video_id} flagged as potential bot-generated content (similarity {similarity_score}).")
+                record_state(checkpoint_file, video_id, FLAGGED, similarity_score=similarity_score)
+                counts[FLAGGED] += 1
         except Exception as e:
             print(f"Error processing {video_id}: {str(e)}")
-            
+            record_state(checkpoint_file, video_id, FAILED, error=str(e))
+            counts[FAILED] += 1
+
+    if not add_to_search_indexes(stored):  # one publish per batch
+        unpublished.extend(stored)
+
+# Function to embed videos from the S3 bucket
+def embed_videos(video_ids_and_urls, checkpoint_path=CHECKPOINT_PATH, retry_failed_only=False, batch_size=EMBED_BATCH_SIZE):
+    """
+    Embed videos in bulk, recording each outcome in a checkpoint file so reruns resume.
+
+    Videos already in Qdrant or recorded as embedded/flagged are skipped. With
+    retry_failed_only=True only videos whose last recorded state is failed are processed.
+    Videos are processed batch_size at a time with embed_batch; batch_size=1 checks each
+    video on its own with embed_single_video.
+
+    Returns:
+        dict: Count of videos per outcome, including skipped.
+    """
+    states = load_checkpoint(checkpoint_path)
+    if retry_failed_only:
+        pending = {video_id for video_id, record in states.items() if record["state"] == FAILED}
+        print(f"Retrying {len(pending)} failed videos")
+    else:
+        done = {video_id for video_id, record in states.items() if record["state"] in (EMBEDDED, FLAGGED)}
+        done.update(retrieve_all_video_ids())  # set membership instead of scanning a list per video
+        print(f"Skipping {len(done)} videos that are already embedded or flagged")
+
+    counts = {EMBEDDED: 0, FLAGGED: 0, FAILED: 0, "skipped": 0}
+    batch, unpublished = [], []
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint_file:
+        for video_id, s3_url in video_ids_and_urls:
+            if (video_id not in pending) if retry_failed_only else (video_id in done):
+                counts["skipped"] += 1
+                continue
+
+            if batch_size > 1:
+                batch.append((video_id, s3_url))
+                if len(batch) >= batch_size:
+                    embed_batch(batch, checkpoint_file, counts, unpublished)
+                    batch = []
+                continue
+
+            try:
+                similarity_score = embed_single_video(video_id, s3_url)
+                if similarity_score is None:
+                    record_state(checkpoint_file, video_id, EMBEDDED)
+                    counts[EMBEDDED] += 1
+                else:
+                    record_state(checkpoint_file, video_id, FLAGGED, similarity_score=similarity_score)
+                    counts[FLAGGED] += 1
+            except Exception as e:
+                print(f"Error processing {video_id}: {str(e)}")
+                record_state(checkpoint_file, video_id, FAILED, error=str(e))
+                counts[FAILED] += 1
+
+        if batch:
+            embed_batch(batch, checkpoint_file, counts, unpublished)
+
+    print(f"Embedding run finished: {counts}")
+    return counts
+
 if __name__ == "__main__":
-    input_file = "ai/scripts/video_url_map.txt"
-    video_ids_and_urls = parse_video_url_map(input_file)
-    embed_videos(video_ids_and_urls)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Embed videos listed in a video URL map")
+    parser.add_argument("--input", default="ai/scripts/video_url_map.txt", help=".txt, .jsonl or .csv video URL map")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--retry-failed", action="store_true", help="only retry videos recorded as failed")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="1 checks every video on its own")
+    args = parser.parse_args()
+
+    video_ids_and_urls = iter_video_url_map(args.input)  # streamed, so the first videos start immediately
+    embed_videos(video_ids_and_urls, args.checkpoint, args.retry_failed, args.batch_size)
@@ -11,16 +11,34 @@ def attention_pooling(embeddings, weights):
     
     return np.average(embeddings, axis=0, weights=final_weights)
 
+def combine_segment_embeddings(video_segments):
+    # Concatenate each clip's visual-text and audio vectors into one 2048-d segment vector
+    visual_segments = [s for s in video_segments if s.embedding_option == 'visual-text']
+    audio_segments = [s for s in video_segments if s.embedding_option == 'audio']
+
+    combined_embeddings = np.array([np.concatenate([np.array(v.float_), np.array(a.float_)]) for v, a in zip(visual_segments, audio_segments)])
+    offsets = [(v.start_offset_sec, v.end_offset_sec) for v in visual_segments[:len(combined_embeddings)]]
+    return combined_embeddings, offsets
+
+def prepare_segment_embeddings(video_segments):
+    """
+    Returns:
+        tuple: (segment_embeddings, offsets) with one 2048-d row and one (start_sec, end_sec) per clip.
+    """
+    if not video_segments:
+        raise ValueError("No video segments provided")
+
+    segment_embeddings, offsets = combine_segment_embeddings(video_segments)
+    print(f"Segment embeddings shape: {segment_embeddings.shape}")
+    return segment_embeddings, offsets
+
 def prepare_embedding(video_segments):
     # video_segments is an array that contains all the segments of a single video
     if not video_segments:
         raise ValueError("No video segments provided")
     
     # Extract embeddings
-    visual_embeddings = [np.array(s.float_) for s in video_segments if s.embedding_option == 'visual-text']
-    audio_embeddings = [np.array(s.float_) for s in video_segments if s.embedding_option == 'audio']
-    
-    combined_embeddings = np.array([np.concatenate([v, a]) for v, a in zip(visual_embeddings, audio_embeddings)])
+    combined_embeddings, _ = combine_segment_embeddings(video_segments)
     print(f"Combined embeddings shape: {combined_embeddings.shape}")
     
     # Calculate weights based on method
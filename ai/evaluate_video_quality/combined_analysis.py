@@ -0,0 +1,79 @@
+'''
+Single Gemini pass per video: rubric quality score, category label and bot-content indicators.
+
+With GEMINI_COMBINED_ANALYSIS=true, quality evaluation and centroid labeling both read the
+combined answer instead of making their own vendor calls (a separate Gemini scoring call and
+a Twelve Labs indexing + analyze call). Results are cached per video URL in a local SQLite
+table shared by every process, so each video is sent to Gemini once. The cache key includes
+a hash of COMBINED_PROMPT and COMBINED_SCHEMA and the GEMINI_PREPROCESS upload settings, so
+editing either or changing what is uploaded re-analyzes videos on demand.
+
+Twelve Labs embeddings are still created on upload: duplicate and segment search need them.
+'''
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import closing
+from ai.tech_stack.gemini import score_video_with_gemini, preprocess_signature
+from ai.tech_stack.single_flight import single_flight
+from ai.evaluate_video_quality.prompt import COMBINED_PROMPT
+from ai.evaluate_video_quality.schema import COMBINED_SCHEMA
+
+GEMINI_COMBINED_ANALYSIS = os.getenv("GEMINI_COMBINED_ANALYSIS", "false").lower() == "true"
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "video_analysis.sqlite3"))
+ANALYSIS_VERSION = f"{hashlib.sha1((COMBINED_PROMPT + json.dumps(COMBINED_SCHEMA, sort_keys=True)).encode()).hexdigest()[:12]}-{preprocess_signature()}"
+
+def connect():
+    connection = sqlite3.connect(ANALYSIS_CACHE_PATH, timeout=30, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+def init_analysis_db():
+    with closing(connect()) as connection:
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS video_analysis (
+                video_url TEXT NOT NULL,
+                version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (video_url, version)
+            )
+        """)
+
+init_analysis_db()
+
+def get_cached_analysis(video_url):
+    with closing(connect()) as connection:
+        row = connection.execute(
+            "SELECT result FROM video_analysis WHERE video_url = ? AND version = ?", (video_url, ANALYSIS_VERSION)
+        ).fetchone()
+    return json.loads(row[0]) if row else None
+
+def cache_analysis(video_url, result):
+    with closing(connect()) as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO video_analysis (video_url, version, result, created_at) VALUES (?, ?, ?, ?)",
+            (video_url, ANALYSIS_VERSION, json.dumps(result), time.time())
+        )
+
+# Function to get the combined Gemini analysis of a video, calling Gemini only on a cache miss
+@single_flight  # concurrent requests for the same video share one Gemini call
+def analyze_video(video_url):
+    """
+    Returns:
+        dict: The rubric criteria with total_score and normalized_score, plus 'category' and
+              'bot_indicators' (likely_bot_generated, confidence, signals, justification).
+    """
+    cached = get_cached_analysis(video_url)
+    if cached is not None:
+        print(f"Using cached analysis for {video_url}")
+        return cached
+
+    result = score_video_with_gemini(video_url, COMBINED_PROMPT, schema=COMBINED_SCHEMA)
+    if 'error' in result:
+        raise Exception(f"Combined analysis failed: {result['error']}")  # not cached, retried next time
+
+    cache_analysis(video_url, result)
+    return result
@@ -1,7 +1,10 @@
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from ai.tech_stack.aws import retrieve_single_s3_url_by_video_id
 from ai.tech_stack.gemini import score_video_normalized
+from ai.tech_stack.single_flight import single_flight
+from ai.evaluate_video_quality.combined_analysis import analyze_video, GEMINI_COMBINED_ANALYSIS
 
+@single_flight  # concurrent requests for the same video_id share one computation
 def evaluate_video_quality(video_id):
     s3_url = retrieve_single_s3_url_by_video_id(video_id)
     
@@ -9,10 +12,23 @@ def evaluate_video_quality(video_id):
         print(f"No S3 URL found for video ID: {video_id}")
         return -1.0
     
+    if GEMINI_COMBINED_ANALYSIS:
+        return analyze_video(s3_url)['normalized_score']  # cached, shared with categorization
+
     quality_score = score_video_normalized(s3_url)
     return quality_score
 
-def evaluate_video_quality_batch(video_id_list, max_workers=8):
+# Function to get the quality score, category and bot indicators of a video from one Gemini pass
+def analyze_video_by_id(video_id):
+    s3_url = retrieve_single_s3_url_by_video_id(video_id)
+
+    if not s3_url:
+        print(f"No S3 URL found for video ID: {video_id}")
+        return None
+
+    return analyze_video(s3_url)
+
+def evaluate_video_quality_batch(video_id_list, max_workers=8, on_progress=None):
     results = {}
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         future_to_id = {executor.submit(evaluate_video_quality, vid): vid for vid in video_id_list}
@@ -24,5 +40,8 @@ def evaluate_video_quality_batch(video_id_list, max_workers=8):
             except Exception as e:
                 print(f"Error processing video {vid}: {e}")
                 results[vid] = -1.0
+            
+            if on_progress:
+                on_progress(len(results) / len(future_to_id), f"Evaluated {len(results)}/{len(future_to_id)} videos")
     
     return results
@@ -1,4 +1,5 @@
-PROMPT = """
+# Role, rubric and scoring guidelines shared by every evaluation prompt; each prompt adds its own output format
+RUBRIC_PROMPT = """
 
 # Content Evaluation Prompt: Value-First Assessment
 
@@ -62,7 +63,9 @@ You are a critical content evaluator for a short-form video platform. Your missi
 - **Comparative Standard**: Compare against the best content in the category, not the platform average
 - **Evidence-Based Scoring**: Each score must be supported by specific, observable qualities
 
-## Output Format
+"""
+
+PROMPT = RUBRIC_PROMPT + """## Output Format
 ```json
 {
   "artistic_merit": {"score": X, "justification": "Brief explanation"},
@@ -74,4 +77,38 @@ You are a critical content evaluator for a short-form video platform. Your missi
 }
 ```
 
-"""
\ No newline at end of file
+"""
+
+# Same evaluation, plus the category and bot-content indicators that otherwise take separate vendor calls
+COMBINED_PROMPT = RUBRIC_PROMPT + """## Additional Outputs
+Alongside the rubric scores, also report:
+
+### Category
+The single YouTube category that best fits the video (e.g. "Education", "Comedy", "Gaming").
+
+### Bot Indicators
+Judge whether the video looks mass-produced by an automated or bot account. List only the signals you actually observe:
+- **ai_generated_visuals**: AI-generated images or video presented as real footage
+- **synthetic_voice**: text-to-speech or cloned narration
+- **reused_or_stitched_footage**: clips re-uploaded or stitched from other creators without transformation
+- **template_slideshow**: generic template with swapped images or stock footage
+- **foreign_watermark**: watermark or UI from another platform or creator
+- **mass_produced_format**: interchangeable, low-effort format typical of content farms
+- **misleading_or_spam_text**: clickbait captions, spam links or unrelated hashtags
+
+Set likely_bot_generated to true only when the signals clearly point to automated production, with a confidence of low, medium or high.
+
+## Output Format
+```json
+{
+  "artistic_creative_merit": {"score": X, "justification": "Brief explanation"},
+  "technical_execution": {"score": X, "justification": "Brief explanation"},
+  "clarity_cohesion": {"score": X, "justification": "Brief explanation"},
+  "value_purpose": {"score": X, "justification": "Brief explanation"},
+  "platform_synergy": {"score": X, "justification": "Brief explanation"},
+  "category": "Education",
+  "bot_indicators": {"likely_bot_generated": false, "confidence": "low", "signals": [], "justification": "Brief explanation"}
+}
+```
+
+"""
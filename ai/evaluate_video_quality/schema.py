@@ -99,4 +99,69 @@ SCHEMA = {
     "value_purpose",
     "platform_synergy"
   ]
-}
\ No newline at end of file
+}
+
+# Rubric criteria that make up total_score (out of 25)
+RUBRIC_KEYS = list(SCHEMA["required"])
+
+VIDEO_CATEGORIES = [
+  "Film & Animation", "Autos & Vehicles", "Music", "Pets & Animals", "Sports", "Travel & Events",
+  "Gaming", "People & Blogs", "Comedy", "Entertainment", "News & Politics", "Howto & Style",
+  "Education", "Science & Technology", "Nonprofits & Activism"
+]
+
+BOT_SIGNALS = [
+  "ai_generated_visuals",
+  "synthetic_voice",
+  "reused_or_stitched_footage",
+  "template_slideshow",
+  "foreign_watermark",
+  "mass_produced_format",
+  "misleading_or_spam_text"
+]
+
+# Rubric scores plus category and bot-content indicators in one response (see COMBINED_PROMPT)
+COMBINED_SCHEMA = {
+  "type": "object",
+  "properties": {
+    **SCHEMA["properties"],
+    "category": {
+      "type": "string",
+      "enum": VIDEO_CATEGORIES,
+      "description": "The YouTube category that best fits the video."
+    },
+    "bot_indicators": {
+      "type": "object",
+      "properties": {
+        "likely_bot_generated": {
+          "type": "boolean",
+          "description": "Whether the video looks mass-produced by an automated or bot account."
+        },
+        "confidence": {
+          "type": "string",
+          "enum": ['low', 'medium', 'high']
+        },
+        "signals": {
+          "type": "array",
+          "items": {"type": "string", "enum": BOT_SIGNALS},
+          "description": "The bot-content signals observed in the video, if any."
+        },
+        "justification": {
+          "type": "string",
+          "description": "A brief explanation of the observed signals."
+        }
+      },
+      "required": [
+        "likely_bot_generated",
+        "confidence",
+        "signals",
+        "justification"
+      ]
+    }
+  },
+  "required": [
+    *SCHEMA["required"],
+    "category",
+    "bot_indicators"
+  ]
+}
@@ -0,0 +1,72 @@
+'''
+Production server config for the AI Flask app.
+
+Run from the repo root:
+    gunicorn -c ai/gunicorn.conf.py
+
+Every setting can be overridden with an environment variable, e.g.
+    WEB_CONCURRENCY=4 GUNICORN_THREADS=16 gunicorn -c ai/gunicorn.conf.py
+
+Workers are threaded (gthread) because most request time is spent waiting on
+Gemini / Twelve Labs / Qdrant / S3, so threads keep a worker busy while a call is in flight.
+The app and its models are loaded once in the master before forking so workers share
+those pages copy-on-write and start serving immediately.
+'''
+import os
+import multiprocessing
+
+wsgi_app = "ai.app:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', 6000)}"  # Render gives $PORT
+
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Vendor calls can be slow; do not let the arbiter kill a worker mid-request
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 300))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Recycle workers periodically to bound memory growth from vendor SDKs. Background jobs run in
+# threads inside the web workers unless JOB_WORKERS=0 (then in python -m ai.job_worker), and a
+# recycled worker kills the jobs it is running, so recycling is off by default while jobs run in-process.
+in_process_jobs = int(os.environ.get("JOB_WORKERS", 2)) > 0
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0 if in_process_jobs else 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before workers are forked
+    if preload_app:
+        from ai.bot_detection.main import preload_models
+        preload_models()
+        server.log.info("Preloaded bot detection models")
+
+        # Map (or build and publish, the first time) the FAISS indexes so forked workers share the pages
+        from ai.tech_stack.faiss_index_store import get_video_index, get_centroid_index, get_segment_index
+        try:
+            get_video_index()
+            get_centroid_index()
+            get_segment_index()
+            server.log.info("Mapped FAISS indexes")
+        except Exception as e:
+            server.log.warning(f"FAISS indexes not preloaded, workers will load them on first use: {e}")
+
+def post_fork(server, worker):
+    # Connections opened while importing in the master must not be shared between workers
+    from ai.tech_stack import qdrant, twelve_labs
+    qdrant.qdrant_client = qdrant.create_qdrant_client()
+    twelve_labs.twelvelabs_client = twelve_labs.create_twelvelabs_client()
+
+    # Each worker process runs its own job threads; they share the SQLite job queue
+    from ai.tech_stack.job_queue import ensure_job_workers
+    ensure_job_workers()
+
+    # Deliver Java server notifications left in the outbox by a previous run
+    from ai.send_requests_to_java_server.outbox import ensure_outbox_dispatcher
+    ensure_outbox_dispatcher()
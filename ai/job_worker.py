@@ -0,0 +1,25 @@
+'''
+Standalone background job runner.
+
+By default job worker threads run inside every gunicorn worker. To keep long jobs (clustering,
+batch evaluation, the duplicate graph) out of web workers that gunicorn restarts, start the
+server with JOB_WORKERS=0 and run the jobs in this process instead, from the repo root:
+    JOB_WORKERS=0 gunicorn -c ai/gunicorn.conf.py
+    python -m ai.job_worker --workers 2
+'''
+import time
+import argparse
+import importlib
+from ai.tech_stack.job_queue import ensure_job_workers
+from ai.send_requests_to_java_server.outbox import ensure_outbox_dispatcher
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run background jobs outside the web server")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    importlib.import_module("ai.app")  # registers the job handlers
+    ensure_job_workers(args.workers)
+    ensure_outbox_dispatcher()
+    while True:
+        time.sleep(3600)  # worker threads are daemons; keep the process alive
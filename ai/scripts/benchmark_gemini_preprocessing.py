@@ -0,0 +1,84 @@
+'''
+Latency and score-agreement benchmark for GEMINI_PREPROCESS.
+
+Each sampled video is scored by Gemini once per preprocessing mode. End-to-end latency
+(download, preprocessing, upload, processing wait and generation) is compared across modes,
+and the rubric scores of the downscaled / keyframe uploads are compared with those of the
+full-quality upload ("none").
+
+Gemini scores are not fully deterministic, so pass --repeats 2 to also measure how often the
+full-quality upload disagrees with itself; a mode is fine when it disagrees about as often.
+
+Run from the repo root:
+    python -m ai.scripts.benchmark_gemini_preprocessing --input ai/scripts/video_url_map.txt --videos 20
+'''
+import time
+import argparse
+from itertools import islice
+import numpy as np
+from ai.tech_stack.gemini import score_video_with_gemini, PREPROCESS_MODES
+from ai.evaluate_video_quality.prompt import PROMPT
+from ai.evaluate_video_quality.schema import SCHEMA
+from ai.scripts.parse_video_ids_and_s3_urls import iter_video_url_map
+
+CRITERIA = SCHEMA["required"]
+
+def score_once(s3_url, mode):
+    start = time.perf_counter()
+    evaluation_data = score_video_with_gemini(s3_url, PROMPT, preprocess=mode)
+    elapsed = time.perf_counter() - start
+    if "error" in evaluation_data:
+        raise Exception(evaluation_data["error"])
+    return elapsed, np.array([int(evaluation_data[key]["score"]) for key in CRITERIA])
+
+def compare(reference, scores):
+    # scores: (n_videos, n_criteria) rubric scores of one run
+    return {
+        "criterion_agreement": float((reference == scores).mean()),
+        "criterion_within_one": float((np.abs(reference - scores) <= 1).mean()),
+        "normalized_score_mae": float(np.abs(reference.sum(axis=1) - scores.sum(axis=1)).mean() / 25.0),
+    }
+
+def benchmark(s3_urls, modes=PREPROCESS_MODES, repeats=1):
+    latencies = {mode: [] for mode in modes}
+    scores = {mode: [] for mode in modes}  # mode -> one (n_videos, n_criteria) array per repeat
+    for repeat in range(repeats):
+        runs = {mode: [] for mode in modes}
+        for s3_url in s3_urls:
+            for mode in modes:
+                elapsed, criterion_scores = score_once(s3_url, mode)
+                latencies[mode].append(elapsed)
+                runs[mode].append(criterion_scores)
+        for mode in modes:
+            scores[mode].append(np.stack(runs[mode]))
+
+    reference = scores["none"][0] if "none" in scores else None
+    results = {}
+    for mode in modes:
+        results[mode] = {
+            "mean_seconds": float(np.mean(latencies[mode])),
+            "p90_seconds": float(np.percentile(latencies[mode], 90)),
+        }
+        if reference is not None:
+            # Against the first full-quality run; for "none" itself only later repeats are compared
+            runs = scores[mode] if mode != "none" else scores[mode][1:]
+            if runs:
+                results[mode].update(compare(np.tile(reference, (len(runs), 1)), np.vstack(runs)))
+
+        r = results[mode]
+        agreement = (f", criteria equal {r['criterion_agreement']:.0%}, within 1 {r['criterion_within_one']:.0%}, "
+                     f"normalized score MAE {r['normalized_score_mae']:.3f}") if "criterion_agreement" in r else ""
+        print(f"{mode:10s} mean {r['mean_seconds']:.1f}s, p90 {r['p90_seconds']:.1f}s{agreement}")
+
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare Gemini scoring latency and scores across upload preprocessing modes")
+    parser.add_argument("--input", default="ai/scripts/video_url_map.txt", help=".txt, .jsonl or .csv video URL map")
+    parser.add_argument("--videos", type=int, default=20)
+    parser.add_argument("--modes", nargs="+", choices=PREPROCESS_MODES, default=list(PREPROCESS_MODES))
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    s3_urls = [s3_url for _, s3_url in islice(iter_video_url_map(args.input), args.videos)]
+    benchmark(s3_urls, args.modes, args.repeats)
@@ -0,0 +1,82 @@
+'''
+Load test for the AI Flask app: throughput and latency percentiles under concurrency.
+
+Start the server to compare in one terminal, e.g.
+    python -m ai.app                          # Flask development server
+    gunicorn -c ai/gunicorn.conf.py           # production config
+then run from the repo root:
+    python -m ai.scripts.benchmark_server --url http://localhost:6000 --concurrency 32 --requests 2000
+
+By default it posts a bot user check built from the test events dataset, which exercises
+aggregation and model scoring without any paid vendor calls.
+'''
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_EVENTS_CSV = "ai/bot_detection/datasets/test_skibidi.csv"
+
+def build_bot_check_payload(events_csv=DEFAULT_EVENTS_CSV, n_events=500):
+    events = pd.read_csv(events_csv).head(n_events)
+    return {"events": events.to_dict(orient="records")}
+
+def run_benchmark(url, path="/admin/run-bot-user-check", method="POST", payload=None,
+                  concurrency=32, total_requests=2000, timeout=60):
+    """
+    Fire total_requests requests with `concurrency` client threads and report
+    throughput and p50/p95/p99 latency.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    def send_one(_):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url + path, json=payload, timeout=timeout)
+            ok = response.status_code < 500
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send_one, range(total_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    errors = sum(1 for _, ok in results if not ok)
+
+    summary = {
+        "requests": total_requests,
+        "errors": errors,
+        "throughput_rps": total_requests / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+    print(f"{method} {url}{path} x{total_requests} @ concurrency {concurrency}")
+    print(f"  throughput : {summary['throughput_rps']:.1f} req/s")
+    print(f"  latency    : p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms")
+    print(f"  errors     : {errors}")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the AI server")
+    parser.add_argument("--url", default="http://localhost:6000")
+    parser.add_argument("--path", default="/admin/run-bot-user-check")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=500, help="events per bot check payload")
+    args = parser.parse_args()
+
+    if args.path == "/admin/run-bot-user-check":
+        run_benchmark(args.url, args.path, "POST", build_bot_check_payload(n_events=args.events),
+                      args.concurrency, args.requests)
+    else:
+        run_benchmark(args.url, args.path, "GET", None, args.concurrency, args.requests)
@@ -0,0 +1,54 @@
+'''
+Self-check for the duplicate graph on a small synthetic catalog.
+
+Builds unit vectors with two known groups of near duplicates (a 4-video ring and a 3-video
+ring), one near-duplicate pair (too small to be a ring) and unrelated videos, range-searches
+them in blocks smaller than the catalog so edges cross block boundaries, and asserts the
+expected edges and rings.
+
+Run from the repo root:
+    python -m ai.scripts.check_duplicate_graph
+'''
+import itertools
+import faiss
+import numpy as np
+from ai.bot_content_detection.duplicate_graph import range_search_block, find_rings, EDGE_DTYPE
+
+DIM = 64
+THRESHOLD = 0.9
+GROUPS = [[0, 5, 9, 14], [2, 11, 17], [6, 19]]  # videos that are near copies of each other
+N_VIDEOS = 20
+
+def synthetic_catalog(seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((N_VIDEOS, DIM)).astype(np.float32)
+    for group in GROUPS:
+        base = rng.standard_normal(DIM).astype(np.float32)
+        for i in group:
+            vectors[i] = base + 0.05 * rng.standard_normal(DIM).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def check_duplicate_graph(block_size=6):
+    vectors = synthetic_catalog()
+    index = faiss.IndexFlatIP(DIM)
+    index.add(vectors)
+
+    blocks = [range_search_block(index, vectors, start, min(start + block_size, N_VIDEOS), THRESHOLD)
+              for start in range(0, N_VIDEOS, block_size)]
+    edges = np.concatenate(blocks) if blocks else np.empty(0, dtype=EDGE_DTYPE)
+
+    expected_edges = {pair for group in GROUPS for pair in itertools.combinations(sorted(group), 2)}
+    found_edges = {(int(src), int(dst)) for src, dst in zip(edges["src"], edges["dst"])}
+    assert found_edges == expected_edges, f"edges {sorted(found_edges)} != expected {sorted(expected_edges)}"
+    assert (edges["similarity"] >= THRESHOLD - 1e-3).all()
+
+    video_ids = np.array([f"video{i}" for i in range(N_VIDEOS)])
+    rings = find_rings(edges, N_VIDEOS, video_ids)
+    assert [ring["size"] for ring in rings] == [4, 3], rings
+    assert [sorted(ring["video_ids"]) for ring in rings] == [sorted(video_ids[group]) for group in GROUPS[:2]], rings
+    assert all(ring["density"] == 1.0 for ring in rings), rings
+
+    print(f"Duplicate graph check passed: {len(edges)} edges, {len(rings)} rings")
+
+if __name__ == "__main__":
+    check_duplicate_graph()
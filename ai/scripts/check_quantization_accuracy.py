@@ -0,0 +1,71 @@
+'''
+Accuracy check for compact vector storage (VECTOR_QUANTIZATION=fp16 / int8).
+
+Each sampled catalog video is queried against the rest of the catalog (its own row is
+excluded, leave-one-out). The duplicate decisions from the float32 flat index are compared
+with those from a float16 snapshot and the SQfp16 / SQ8 indexes, using the same
+DUPLICATE_SIMILARITY_THRESHOLD rule as bot content detection.
+
+Run from the repo root:
+    python -m ai.scripts.check_quantization_accuracy --queries 2000
+'''
+import argparse
+import time
+import numpy as np
+from ai.tech_stack.qdrant import retrieve_all_from_qdrant, VIDEO_COLLECTION_NAME
+from ai.tech_stack.faiss_algo import build_ip_index, DUPLICATE_SIMILARITY_THRESHOLD
+
+BYTES_PER_DIM = {"none": 4, "fp16": 2, "int8": 1}
+
+def flag_decisions(index, queries, query_ids, k):
+    # Search one extra neighbor so the query's own row can be dropped
+    similarity, ind = index.search(queries, k + 1)
+    not_self = ind != query_ids[:, None]
+    flagged = (similarity >= DUPLICATE_SIMILARITY_THRESHOLD) & not_self
+    best_similarity = np.where(not_self, similarity, -np.inf).max(axis=1)
+    return flagged.any(axis=1), best_similarity
+
+def check_accuracy(vectors, n_queries=2000, k=5, seed=0):
+    rng = np.random.default_rng(seed)
+    query_ids = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = np.ascontiguousarray(vectors[query_ids], dtype=np.float32)
+
+    variants = {
+        "float32 flat (reference)": (vectors, "none"),
+        "float16 snapshot, flat": (vectors.astype(np.float16), "none"),
+        "SQfp16 index": (vectors, "fp16"),
+        "SQ8 index": (vectors, "int8"),
+    }
+
+    results = {}
+    reference = None
+    for name, (snapshot, quantization) in variants.items():
+        start = time.perf_counter()
+        index = build_ip_index(snapshot, quantization=quantization)
+        flags, best_similarity = flag_decisions(index, queries, query_ids, k)
+        elapsed = time.perf_counter() - start
+
+        if reference is None:
+            reference = (flags, best_similarity)
+        ref_flags, ref_similarity = reference
+        finite = np.isfinite(best_similarity) & np.isfinite(ref_similarity)
+        results[name] = {
+            "flagged": int(flags.sum()),
+            "changed_flags": int((flags != ref_flags).sum()),
+            "max_similarity_error": float(np.abs(best_similarity[finite] - ref_similarity[finite]).max()) if finite.any() else 0.0,
+            "index_mb": len(vectors) * vectors.shape[1] * BYTES_PER_DIM[quantization] / 1e6,
+            "seconds": elapsed,
+        }
+        r = results[name]
+        print(f"{name:26s} flagged {r['flagged']:6d}, changed {r['changed_flags']:4d}, "
+              f"max cosine error {r['max_similarity_error']:.5f}, index {r['index_mb']:.1f} MB, {r['seconds']:.2f}s")
+
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare duplicate flags for float32 and quantized embeddings")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    check_accuracy(retrieve_all_from_qdrant(VIDEO_COLLECTION_NAME), args.queries, args.k)
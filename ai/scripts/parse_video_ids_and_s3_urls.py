@@ -1,54 +1,124 @@
 import ast
 import os
+import csv
+import json
+import argparse
 
-def parse_video_url_map(file_path):
+def parse_map_line(line):
+    """
+    Parse one line of the legacy text format, e.g. '"["filename.mp4", "https://..."]"'.
+
+    json.loads handles the lines this repo writes; ast.literal_eval is kept as a fallback
+    for lines written as Python literals (single quotes).
     """
-    Parses a text file containing video file and URL pairs.
+    # Remove leading/trailing whitespace and the outer quotes
+    cleaned_line = line.strip().strip('"')
+    if not cleaned_line:
+        return None  # Skip empty lines
+
+    try:
+        item_list = json.loads(cleaned_line)
+    except ValueError:
+        # Safely evaluate the string as a Python literal
+        item_list = ast.literal_eval(cleaned_line)
+
+    # Ensure the parsed item is a list with two elements
+    if isinstance(item_list, list) and len(item_list) == 2:
+        return tuple(item_list)
+    raise ValueError("expected a list of two elements")
+
+def iter_jsonl(file):
+    # Each line is {"video_id": ..., "url": ...} or a two-element array
+    for line in file:
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            if isinstance(item, dict):
+                yield item["video_id"], item["url"]
+            elif isinstance(item, list) and len(item) == 2:
+                yield tuple(item)
+            else:
+                print(f"Warning: Skipping malformed line: {line.strip()}")
+        except (ValueError, KeyError) as e:
+            print(f"Error parsing line: {line.strip()} - {e}")
+
+def iter_csv(file):
+    # Two columns, video_id and url; a header row with those names is optional
+    for row in csv.reader(file):
+        if not row or row == ["video_id", "url"]:
+            continue
+        if len(row) == 2:
+            yield row[0], row[1]
+        else:
+            print(f"Warning: Skipping malformed row: {row}")
 
-    Each line in the file is expected to be a string representation of a
-    Python list, e.g., '["filename.mp4", "https://example.com/url.mp4"]'.
-    This function reads the file and converts the data into a list of
-    tuples.
+def iter_legacy(file):
+    for line in file:
+        try:
+            item = parse_map_line(line)
+            if item is not None:
+                yield item
+        except (ValueError, SyntaxError) as e:
+            print(f"Error parsing line: {line.strip()} - {e}")
+
+def iter_video_url_map(file_path):
+    """
+    Lazily yield (video filename, video URL) pairs from a video URL map.
+
+    The format is picked from the extension: .jsonl (JSON Lines), .csv, or anything else
+    for the legacy text format with one quoted list per line. Only one line is held in
+    memory at a time, so callers can start processing the first rows immediately.
 
     Args:
-        file_path (str): The path to the input text file.
+        file_path (str): The path to the input file.
 
-    Returns:
-        list: A list of tuples, where each tuple contains two strings
-              (video filename, video URL).
+    Yields:
+        tuple: (video filename, video URL).
     """
-    parsed_data = []
-    
     # Check if the file exists to prevent errors
     if not os.path.exists(file_path):
         print(f"Error: The file '{file_path}' was not found.")
-        return []
+        return
 
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line in file:
-                # Remove leading/trailing whitespace and the outer quotes
-                cleaned_line = line.strip().strip('"')
-                if not cleaned_line:
-                    continue  # Skip empty lines
-
-                try:
-                    # Safely evaluate the string as a Python literal
-                    # ast.literal_eval is safer than eval() for parsing literals
-                    item_list = ast.literal_eval(cleaned_line)
-                    
-                    # Ensure the parsed item is a list with two elements
-                    if isinstance(item_list, list) and len(item_list) == 2:
-                        parsed_data.append(tuple(item_list))
-                    else:
-                        print(f"Warning: Skipping malformed line: {line.strip()}")
-                except (ValueError, SyntaxError) as e:
-                    print(f"Error parsing line: {line.strip()} - {e}")
-                    
-        return parsed_data
+    extension = os.path.splitext(file_path)[1].lower()
+    reader = {".jsonl": iter_jsonl, ".csv": iter_csv}.get(extension, iter_legacy)
 
+    try:
+        with open(file_path, 'r', encoding='utf-8', newline='') as file:
+            yield from reader(file)
     except IOError as e:
         print(f"Error reading the file: {e}")
-        return []
 
-    return parsed_data
\ No newline at end of file
+def parse_video_url_map(file_path):
+    """
+    Parses a video URL map into a list of (video filename, video URL) tuples.
+
+    Reads the whole file; use iter_video_url_map to stream large maps instead.
+
+    Args:
+        file_path (str): The path to the input file.
+
+    Returns:
+        list: A list of tuples, where each tuple contains two strings
+              (video filename, video URL).
+    """
+    return list(iter_video_url_map(file_path))
+
+# Function to rewrite a video URL map as JSON Lines
+def convert_to_jsonl(input_path, output_path):
+    count = 0
+    with open(output_path, 'w', encoding='utf-8') as out:
+        for video_id, url in iter_video_url_map(input_path):
+            out.write(json.dumps({"video_id": video_id, "url": url}) + "\n")
+            count += 1
+    print(f"Wrote {count} entries to {output_path}")
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a video URL map to JSON Lines")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    args = parser.parse_args()
+
+    convert_to_jsonl(args.input, args.output)
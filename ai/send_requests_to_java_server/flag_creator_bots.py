@@ -1,17 +1,39 @@
-import requests
+from ai.send_requests_to_java_server.java_client import post_to_java_server, send_in_background, get_batch_sender
+
+FLAG_ENDPOINT = "/api/video/receive-creator-bots"
+FLAG_BATCH_ENDPOINT = "/api/video/receive-creator-bots/batch"
 
 def flag_creator_bots(video_id, similarity_score):
-    api_endpoint = "https://your-api-endpoint.com/api/video/receive-creator-bots"
-    
     params = {
         "videoId": video_id,
         "similarityScore": similarity_score
     }
     
-    response = requests.post(api_endpoint, params=params)
+    response = post_to_java_server(FLAG_ENDPOINT, params=params)
     
     if response.status_code == 200:
         print(f"Successfully flagged video {video_id} as potential bot content.")
     else:
         print(f"Failed to flag video {video_id}. "
               f"Status code: {response.status_code}, Response: {response.text}")
+
+# Function to flag many videos in one request
+def flag_creator_bots_batch(flags):
+    # flags is a list of (video_id, similarity_score) tuples
+    payload = [{"videoId": video_id, "similarityScore": similarity_score} for video_id, similarity_score in flags]
+    
+    response = post_to_java_server(FLAG_BATCH_ENDPOINT, json=payload)
+    
+    if response.status_code == 200:
+        print(f"Successfully flagged {len(payload)} videos as potential bot content.")
+    else:
+        print(f"Failed to flag {len(payload)} videos. "
+              f"Status code: {response.status_code}, Response: {response.text}")
+
+# Function to flag a video without waiting on the Java server
+def flag_creator_bots_async(video_id, similarity_score):
+    return send_in_background(flag_creator_bots, video_id, similarity_score)
+
+# Function to buffer a flag; buffered flags are sent together through the batch endpoint
+def flag_creator_bots_buffered(video_id, similarity_score):
+    get_batch_sender(FLAG_BATCH_ENDPOINT).add({"videoId": video_id, "similarityScore": similarity_score})
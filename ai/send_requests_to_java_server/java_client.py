@@ -0,0 +1,175 @@
+'''
+Shared HTTP client for calls to the Java server.
+
+Pooled requests.Sessions keep connections alive across calls, every request has a timeout,
+and transient failures are retried with exponential backoff. A POST is only retried when the
+connection could not be made, since the server may have acted on a request whose response was
+lost; POSTs that carry an Idempotency-Key header (e.g. from the outbox) go to endpoints that
+skip repeats and are also retried after read errors, 429 and 5xx. BatchSender buffers items and
+posts them as one JSON list when the buffer fills up or a flush interval passes, requeueing a
+batch that failed transiently, and send_in_background runs a call on a background thread so
+callers never wait on the Java server.
+'''
+import os
+import time
+import atexit
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+JAVA_SERVER_URL = os.getenv("JAVA_SERVER_URL", "https://your-api-endpoint.com")
+REQUEST_TIMEOUT = (3.05, 15)  # (connect, read) seconds
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.5  # sleeps 0.5s, 1s, 2s, 4s, ... between retries
+MAX_BATCH_BACKOFF = 60  # longest pause before resending a failed batch
+POOL_SIZE = 32
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+def create_session(retry_posts=False):
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        # Connect errors are retried for every method; read errors and statuses only for these
+        allowed_methods=None if retry_posts else Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+session = create_session()
+idempotent_session = create_session(retry_posts=True)
+
+# Function to post to a Java server endpoint using the pooled session
+def post_to_java_server(path, params=None, json=None, headers=None):
+    # Only requests the server can recognize as repeats are retried after they may have been received
+    client = idempotent_session if headers and "Idempotency-Key" in headers else session
+    return client.post(f"{JAVA_SERVER_URL}{path}", params=params, json=json, headers=headers, timeout=REQUEST_TIMEOUT)
+
+# ----------------------
+# Fire-and-forget sends
+# ----------------------
+background_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="java-client")
+
+def send_in_background(func, *args, **kwargs):
+    """Run func on a background thread; failures are printed instead of raised to the caller."""
+    def run():
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            print(f"Background call {func.__name__} failed: {str(e)}")
+
+    return background_executor.submit(run)
+
+# ----------------------
+# Buffered batch sends
+# ----------------------
+class BatchSender:
+    """
+    Buffer items and post them to `path` as a JSON list.
+
+    A batch is sent when max_batch_size items are buffered or flush_interval seconds have
+    passed since the first buffered item, whichever comes first. add() never blocks on the network.
+    A batch that fails with a connection error, 429 or 5xx goes back to the front of the buffer
+    and sending pauses with exponential backoff; a 4xx rejection is dropped. At most
+    max_buffered items are kept, the oldest are dropped beyond that.
+    The endpoint must skip items it has already stored, as a batch whose response was lost is sent again.
+    Use get_batch_sender() to share one sender per path within a process.
+    """
+    def __init__(self, path, max_batch_size=100, flush_interval=2.0, max_buffered=10_000):
+        self.path = path
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.items = []
+        self.first_item_at = None
+        self.failures = 0
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        threading.Thread(target=self.run, name=f"batch-sender{path}", daemon=True).start()
+        atexit.register(self.flush)  # do not drop buffered items when a script finishes
+
+    def add(self, item):
+        with self.lock:
+            if not self.items:
+                self.first_item_at = time.monotonic()
+            self.items.append(item)
+            self.drop_overflow()
+            if len(self.items) >= self.max_batch_size:
+                self.wakeup.set()
+
+    def drop_overflow(self):
+        overflow = len(self.items) - self.max_buffered
+        if overflow > 0:
+            del self.items[:overflow]
+            print(f"Dropped {overflow} buffered items for {self.path}: buffer full")
+
+    def take_batch(self):
+        with self.lock:
+            batch, self.items = self.items[:self.max_batch_size], self.items[self.max_batch_size:]
+            self.first_item_at = time.monotonic() if self.items else None
+            return batch
+
+    def requeue(self, batch):
+        with self.lock:
+            self.items = batch + self.items
+            self.drop_overflow()
+            self.first_item_at = self.first_item_at or time.monotonic()
+            self.failures += 1
+            delay = min(BACKOFF_FACTOR * 2 ** self.failures, MAX_BATCH_BACKOFF)
+            self.retry_at = time.monotonic() + delay
+        print(f"Requeued batch of {len(batch)} items for {self.path}, retrying in {delay:.1f}s")
+
+    def send(self, batch):
+        """Returns False if the batch failed transiently and should be sent again."""
+        try:
+            response = post_to_java_server(self.path, json=batch)
+        except requests.RequestException as e:
+            print(f"Failed to send batch of {len(batch)} items to {self.path}: {str(e)}")
+            return False
+
+        if response.status_code == 200:
+            print(f"Sent batch of {len(batch)} items to {self.path}")
+            return True
+        print(f"Failed to send batch of {len(batch)} items to {self.path}. "
+              f"Status code: {response.status_code}, Response: {response.text}")
+        return response.status_code not in RETRY_STATUSES  # other 4xx: resending will not help
+
+    def flush(self):
+        while True:
+            batch = self.take_batch()
+            if not batch:
+                return
+            if not self.send(batch):
+                self.requeue(batch)
+                return
+            self.failures = 0
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            with self.lock:
+                due = self.items and time.monotonic() >= self.retry_at and (
+                    len(self.items) >= self.max_batch_size
+                    or time.monotonic() - self.first_item_at >= self.flush_interval
+                )
+            if due:
+                self.flush()
+
+batch_senders = {}
+batch_senders_lock = threading.Lock()
+
+# Function to get the process-wide batch sender for an endpoint, creating it on first use
+def get_batch_sender(path):
+    with batch_senders_lock:
+        if path not in batch_senders:
+            batch_senders[path] = BatchSender(path)
+        return batch_senders[path]
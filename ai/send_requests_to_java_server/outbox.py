@@ -0,0 +1,186 @@
+'''
+Durable outbox for notifications to the Java server.
+
+Callers enqueue a notification into a local SQLite table and return immediately; the write is
+committed before enqueue returns, so a flag survives a crash or a Java server outage. A
+dispatcher thread per process drains the table in batches to each endpoint's batch route and
+deletes rows only after a 200 response. Failed batches stay in the table and are retried with
+exponential backoff.
+
+Every notification has an idempotency key (e.g. creator-bot:<video_id>): enqueueing the same
+key twice keeps a single row, and the batch is posted with an Idempotency-Key header. Delivery
+is at-least-once, so the Java batch endpoints skip items they have already stored.
+'''
+import os
+import json
+import time
+import atexit
+import sqlite3
+import hashlib
+import threading
+import requests
+from contextlib import closing
+from ai.send_requests_to_java_server.java_client import post_to_java_server
+
+OUTBOX_DB_PATH = os.getenv("OUTBOX_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "outbox.sqlite3"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+POLL_INTERVAL = 2.0
+LEASE_SECONDS = 60  # a claimed batch is retried by another process if it is not settled in time
+MAX_BACKOFF_SECONDS = 300
+
+CREATOR_BOT_BATCH_ENDPOINT = "/api/video/receive-creator-bots/batch"
+
+_dispatcher_pid = None
+_dispatcher_lock = threading.Lock()
+_notification_available = threading.Event()
+
+def connect():
+    connection = sqlite3.connect(OUTBOX_DB_PATH, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+def init_outbox_db():
+    with closing(connect()) as connection:
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                endpoint TEXT NOT NULL,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        connection.execute("CREATE INDEX IF NOT EXISTS outbox_endpoint_due ON outbox (endpoint, next_attempt_at)")
+
+# Function to durably queue a notification for the Java server
+def enqueue_notification(endpoint, idempotency_key, payload):
+    """
+    Store a notification and wake the dispatcher.
+
+    Returns:
+        bool: False if a notification with the same idempotency key is already pending.
+    """
+    ensure_outbox_dispatcher()
+    timestamp = time.time()
+    with closing(connect()) as connection:
+        cursor = connection.execute(
+            "INSERT OR IGNORE INTO outbox (endpoint, idempotency_key, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+            (endpoint, idempotency_key, json.dumps(payload), timestamp, timestamp)
+        )
+    _notification_available.set()
+    return cursor.rowcount == 1
+
+# Function to queue a creator bot flag; repeated flags for the same video collapse into one
+def enqueue_creator_bot_flag(video_id, similarity_score):
+    return enqueue_notification(
+        CREATOR_BOT_BATCH_ENDPOINT,
+        f"creator-bot:{video_id}",
+        {"videoId": video_id, "similarityScore": similarity_score}
+    )
+
+# Function to count notifications still waiting to be delivered
+def pending_count():
+    with closing(connect()) as connection:
+        return connection.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+def claim_batch(batch_size=OUTBOX_BATCH_SIZE):
+    """Lease up to batch_size due rows for one endpoint so other processes skip them."""
+    timestamp = time.time()
+    with closing(connect()) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            first = connection.execute(
+                "SELECT endpoint FROM outbox WHERE next_attempt_at <= ? ORDER BY id LIMIT 1", (timestamp,)
+            ).fetchone()
+            rows = []
+            if first:
+                rows = connection.execute(
+                    "SELECT * FROM outbox WHERE endpoint = ? AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                    (first["endpoint"], timestamp, batch_size)
+                ).fetchall()
+                connection.executemany(
+                    "UPDATE outbox SET next_attempt_at = ? WHERE id = ?",
+                    [(timestamp + LEASE_SECONDS, row["id"]) for row in rows]
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+    return rows
+
+def mark_delivered(rows):
+    with closing(connect()) as connection:
+        connection.executemany("DELETE FROM outbox WHERE id = ?", [(row["id"],) for row in rows])
+
+def mark_failed(rows, error):
+    timestamp = time.time()
+    with closing(connect()) as connection:
+        connection.executemany(
+            "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            [(timestamp + min(2 ** row["attempts"], MAX_BACKOFF_SECONDS), error, row["id"]) for row in rows]
+        )
+
+def deliver_batch(rows):
+    endpoint = rows[0]["endpoint"]
+    idempotency_key = hashlib.sha256("\n".join(row["idempotency_key"] for row in rows).encode()).hexdigest()
+    payload = [json.loads(row["payload"]) for row in rows]
+
+    try:
+        response = post_to_java_server(endpoint, json=payload, headers={"Idempotency-Key": idempotency_key})
+    except requests.RequestException as e:
+        mark_failed(rows, str(e))
+        print(f"Failed to deliver {len(rows)} notifications to {endpoint}, will retry: {str(e)}")
+        return False
+
+    if response.status_code == 200:
+        mark_delivered(rows)
+        print(f"Delivered {len(rows)} notifications to {endpoint}")
+        return True
+
+    mark_failed(rows, f"{response.status_code}: {response.text[:500]}")
+    print(f"Failed to deliver {len(rows)} notifications to {endpoint}, will retry. "
+          f"Status code: {response.status_code}, Response: {response.text}")
+    return False
+
+# Function to send every due notification now; returns how many were delivered
+def drain_outbox():
+    delivered = 0
+    while True:
+        rows = claim_batch()
+        if not rows or not deliver_batch(rows):
+            return delivered
+        delivered += len(rows)
+
+def dispatcher_loop():
+    while True:
+        try:
+            drain_outbox()
+        except Exception as e:
+            print(f"Outbox dispatcher error: {str(e)}")
+        _notification_available.wait(POLL_INTERVAL)
+        _notification_available.clear()
+
+# Function to start this process's dispatcher thread (safe to call repeatedly and after fork)
+def ensure_outbox_dispatcher():
+    global _dispatcher_pid
+    with _dispatcher_lock:
+        if _dispatcher_pid == os.getpid():
+            return
+        init_outbox_db()
+        threading.Thread(target=dispatcher_loop, name="outbox-dispatcher", daemon=True).start()
+        _dispatcher_pid = os.getpid()
+
+def flush_on_exit():
+    # Best effort: anything not delivered stays in the outbox for the next run
+    if _dispatcher_pid != os.getpid():
+        return
+    try:
+        drain_outbox()
+    except Exception as e:
+        print(f"Outbox flush failed, pending notifications are kept for the next run: {str(e)}")
+
+atexit.register(flush_on_exit)
@@ -1,18 +1,22 @@
-import requests
+from ai.send_requests_to_java_server.java_client import post_to_java_server, send_in_background
+
+UPLOAD_ENDPOINT = "/api/video/upload"
 
 def post_video_into_java_server(video_id, s3_url, quality_score):
-    api_endpoint = "https://your-api-endpoint.com/api/video/upload"
-    
     params = {
         "videoId": video_id,
         "s3Url": s3_url,
         "qualityScore": quality_score,
     }
     
-    response = requests.post(api_endpoint, params=params)
+    response = post_to_java_server(UPLOAD_ENDPOINT, params=params)
     
     if response.status_code == 200:
         print(f"Successfully upload video into java server.")
     else:
         print(f"Failed to upload video {video_id}. "
-              f"Status code: {response.status_code}, Response: {response.text}")
\ No newline at end of file
+              f"Status code: {response.status_code}, Response: {response.text}")
+
+# Function to upload a video without waiting on the Java server
+def post_video_into_java_server_async(video_id, s3_url, quality_score):
+    return send_in_background(post_video_into_java_server, video_id, s3_url, quality_score)
@@ -1,6 +1,14 @@
 import os
+import json
+import time
 import uuid
+import fcntl
+import hashlib
+import threading
 import boto3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 from urllib.parse import urlparse
@@ -11,17 +19,147 @@ load_dotenv()
 # AWS Configuration
 AWS_BUCKET_NAME = "tiktok-video-embeddings"
 AWS_REGION = "ap-southeast-1"
+VIDEO_PREFIX = "videos-embed/"
 
-# Initialize S3 client
+# Local index of uploaded videos: S3 filename -> {'key', 'url', 'etag', 'size'}
+S3_URL_INDEX_PATH = os.getenv("S3_URL_INDEX_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "s3_url_index.json"))
+
+# Bulk upload tuning: files run in parallel and large files are split into parallel parts
+UPLOAD_MAX_WORKERS = int(os.getenv("S3_UPLOAD_MAX_WORKERS", 16))
+MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=MULTIPART_CHUNKSIZE,
+    multipart_chunksize=MULTIPART_CHUNKSIZE,
+    max_concurrency=8,
+    use_threads=True
+)
+VIDEO_UPLOAD_ARGS = {
+    'ACL': 'public-read',
+    'ContentType': 'video/mp4'
+}
+
+# Initialize S3 client (connection pool sized for parallel files x parts)
 s3_client = boto3.client(
     's3',
     aws_access_key_id=os.getenv("AWS_ACCESS_KEY"),
     aws_secret_access_key=os.getenv("AWS_SECRET_KEY"),
-    region_name=AWS_REGION
+    region_name=AWS_REGION,
+    config=Config(max_pool_connections=UPLOAD_MAX_WORKERS * TRANSFER_CONFIG.max_request_concurrency)
 )
 
+# ----------------------
+# video_id -> S3 URL index
+# ----------------------
+# Keyed by object basename: "<filename>" for bulk uploads, "<8-char uuid>_<filename>" (the video id)
+# for single uploads. Every process merges its entries into the shared file under a file lock.
+s3_url_index = None  # loaded lazily from S3_URL_INDEX_PATH or a bulk listing
+s3_url_index_mtime = None  # mtime of the file as of our last load or save
+s3_url_index_lock = threading.RLock()
+
+# Ids whose listing found nothing are not listed again for this long
+MISSING_VIDEO_TTL_SECONDS = 300
+missing_video_ids = {}  # video_id -> time of the listing that missed
+
+def s3_object_url(key):
+    return f"https://{AWS_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{key}"
+
+def s3_filename_from_video_id(video_id):
+    # video ids are "<8-char uuid>_<filename>", objects are stored under the filename
+    return video_id.split("_", 1)[1]
+
+def read_s3_url_index_file():
+    with open(S3_URL_INDEX_PATH) as f:
+        return json.load(f), os.fstat(f.fileno()).st_mtime
+
+def save_s3_url_index(replace=False):
+    """
+    Write the index to S3_URL_INDEX_PATH. Entries saved by other processes since our last load
+    are merged in (and kept in memory) unless replace=True, as after a full bucket listing.
+    """
+    global s3_url_index, s3_url_index_mtime
+    with s3_url_index_lock:
+        if s3_url_index is None:
+            return
+        with open(f"{S3_URL_INDEX_PATH}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not replace and os.path.exists(S3_URL_INDEX_PATH):
+                on_disk, _ = read_s3_url_index_file()
+                s3_url_index = {**on_disk, **s3_url_index}
+
+            tmp_path = f"{S3_URL_INDEX_PATH}.tmp-{os.getpid()}"
+            with open(tmp_path, 'w') as f:
+                json.dump(s3_url_index, f)
+            os.replace(tmp_path, S3_URL_INDEX_PATH)
+            s3_url_index_mtime = os.path.getmtime(S3_URL_INDEX_PATH)
+
+def reload_s3_url_index():
+    """Merge in entries other processes saved since our last load or save; True if there were any."""
+    global s3_url_index, s3_url_index_mtime
+    with s3_url_index_lock:
+        if not os.path.exists(S3_URL_INDEX_PATH) or os.path.getmtime(S3_URL_INDEX_PATH) == s3_url_index_mtime:
+            return False
+        on_disk, s3_url_index_mtime = read_s3_url_index_file()
+        s3_url_index = {**on_disk, **(s3_url_index or {})}
+        return True
+
+def refresh_s3_url_index(prefix=VIDEO_PREFIX):
+    """
+    Rebuild the local index with one paginated ListObjectsV2 sweep over the prefix
+    (1,000 keys per call) and persist it to S3_URL_INDEX_PATH.
+    """
+    global s3_url_index
+    try:
+        index = {}
+        paginator = s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=AWS_BUCKET_NAME, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                index[os.path.basename(obj['Key'])] = {
+                    'key': obj['Key'],
+                    'url': s3_object_url(obj['Key']),
+                    'etag': obj['ETag'].strip('"'),
+                    'size': obj['Size'],
+                }
+
+        with s3_url_index_lock:
+            s3_url_index = index
+            save_s3_url_index(replace=True)
+        print(f"Indexed {len(index)} S3 objects under {prefix}")
+        return index
+
+    except ClientError as e:
+        print(f"Error listing S3 files: {str(e)}")
+        raise
+
+def get_s3_url_index():
+    global s3_url_index, s3_url_index_mtime
+    with s3_url_index_lock:
+        if s3_url_index is None:
+            if os.path.exists(S3_URL_INDEX_PATH):
+                s3_url_index, s3_url_index_mtime = read_s3_url_index_file()
+                print(f"Loaded {len(s3_url_index)} entries from {S3_URL_INDEX_PATH}")
+            else:
+                refresh_s3_url_index()
+        return s3_url_index
+
+def find_indexed_video(video_id):
+    # Single uploads are stored under the video id itself, bulk uploads under the bare filename
+    index = get_s3_url_index()
+    return index.get(video_id) or index.get(s3_filename_from_video_id(video_id))
+
+# Function to record an uploaded object in the index so lookups never need to list it
+def index_uploaded_video(key, size, etag=None, save=True):
+    with s3_url_index_lock:
+        get_s3_url_index()[os.path.basename(key)] = {
+            'key': key,
+            'url': s3_object_url(key),
+            'etag': etag,
+            'size': size,
+        }
+        if save:
+            save_s3_url_index()
+
 # Function to upload a single video to S3
-def upload_single_to_s3(folder_path, filename):
+def upload_single_to_s3(folder_path, filename, save_index=True):
     try:
         video_id = f"{str(uuid.uuid4())[:8]}_{filename}"
         file_path = os.path.join(folder_path, filename)
@@ -31,51 +169,102 @@ def upload_single_to_s3(folder_path, filename):
             file_path,
             AWS_BUCKET_NAME,
             f"videos-embed/{video_id}",
-            ExtraArgs={
-                'ACL': 'public-read',
-                'ContentType': 'video/mp4'
-            }
+            ExtraArgs=VIDEO_UPLOAD_ARGS,
+            Config=TRANSFER_CONFIG
         )
 
-        # Generate the public URL
-        url = f"https://{AWS_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/videos-embed/{filename}"
+        # Generate the public URL of the uploaded object
+        url = s3_object_url(f"videos-embed/{video_id}")
         print(f"Uploaded to S3: {url}")
+        index_uploaded_video(f"videos-embed/{video_id}", os.path.getsize(file_path), save=save_index)
         return video_id, url
 
     except ClientError as e:
         print(f"Error uploading to S3: {str(e)}")
         raise
 
+# Function to compute the ETag S3 would assign to a file uploaded with TRANSFER_CONFIG
+def compute_local_etag(file_path, chunksize=MULTIPART_CHUNKSIZE):
+    part_digests = []
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunksize), b''):
+            part_digests.append(hashlib.md5(chunk).digest())
+
+    if len(part_digests) <= 1 and os.path.getsize(file_path) < TRANSFER_CONFIG.multipart_threshold:
+        return part_digests[0].hex() if part_digests else hashlib.md5(b'').hexdigest()
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+def already_uploaded(file_path, key):
+    """True if the index holds key with the same size (and the same ETag when it is known)."""
+    entry = get_s3_url_index().get(os.path.basename(key))
+    if not entry or entry['key'] != key or entry['size'] != os.path.getsize(file_path):
+        return False
+    return entry['etag'] is None or entry['etag'] == compute_local_etag(file_path)
+
+# Function to upload one file unless the same content is already indexed under key
+def upload_file_if_changed(file_path, key, save_index=True):
+    """
+    Returns:
+        tuple: (size, skipped)
+    """
+    size = os.path.getsize(file_path)
+    if already_uploaded(file_path, key):
+        return size, True
+
+    s3_client.upload_file(file_path, AWS_BUCKET_NAME, key, ExtraArgs=VIDEO_UPLOAD_ARGS, Config=TRANSFER_CONFIG)
+    index_uploaded_video(key, size, save=save_index)
+    return size, False
+
+# Function to upload many files in parallel, skipping ones already in the bucket
+def upload_files_to_s3(uploads, max_workers=UPLOAD_MAX_WORKERS):
+    """
+    Upload files concurrently with multipart transfers.
+
+    Args:
+        uploads (list): (file_path, s3_key) pairs
+        max_workers (int): Number of files uploaded at the same time
+
+    Returns:
+        dict: s3_key -> {'url', 'size', 'skipped'}
+    """
+    results = {}
+    uploaded_bytes = 0
+    start = time.perf_counter()
+
+    def upload_one(file_path, key):
+        return (key, *upload_file_if_changed(file_path, key, save_index=False))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(upload_one, file_path, key) for file_path, key in uploads]
+            for future in as_completed(futures):
+                key, size, skipped = future.result()
+                results[key] = {'url': s3_object_url(key), 'size': size, 'skipped': skipped}
+                if not skipped:
+                    uploaded_bytes += size
+    except ClientError as e:
+        print(f"Error uploading to S3: {str(e)}")
+        raise
+    finally:
+        save_s3_url_index()
+
+    elapsed = time.perf_counter() - start
+    skipped_count = sum(1 for r in results.values() if r['skipped'])
+    print(f"Uploaded {len(results) - skipped_count} files ({uploaded_bytes / 1e6:.1f} MB) in {elapsed:.1f}s "
+          f"at {uploaded_bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s, skipped {skipped_count} already uploaded")
+    return results
+
 # Function to upload bunch of videos to S3 
-def upload_to_s3(folder_path):
-    video_ids_and_urls = []
+def upload_to_s3(folder_path, max_workers=UPLOAD_MAX_WORKERS):
     video_files = [f for f in os.listdir(folder_path) if f.endswith('.mp4')]
-    
-    for filename in video_files:
-        try:
-            video_id = f"{str(uuid.uuid4())[:8]}_{filename}"
-            
-            file_path = os.path.join(folder_path, filename)
-            
-            # Upload the file
-            s3_client.upload_file(
-                file_path,
-                AWS_BUCKET_NAME,
-                f"videos-embed/{filename}",
-                ExtraArgs={
-                    'ACL': 'public-read',
-                    'ContentType': 'video/mp4'
-                }
-            )
+    uploads = [(os.path.join(folder_path, filename), f"videos-embed/{filename}") for filename in video_files]
 
-            # Generate the public URL
-            url = f"https://{AWS_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/videos-embed/{filename}"
-            print(f"Uploaded to S3: {url}")
-            video_ids_and_urls.append((video_id, url))
+    results = upload_files_to_s3(uploads, max_workers=max_workers)
 
-        except ClientError as e:
-            print(f"Error uploading to S3: {str(e)}")
-            raise
+    video_ids_and_urls = []
+    for filename in video_files:
+        video_id = f"{str(uuid.uuid4())[:8]}_{filename}"
+        video_ids_and_urls.append((video_id, results[f"videos-embed/{filename}"]['url']))
         
     return video_ids_and_urls
 
@@ -202,8 +391,19 @@ def list_s3_urls(prefix="videos-embed/", max_files=20):
         raise
     
 def retrieve_single_s3_url_by_video_id(video_id, max_files=1):
+    # Served from the local index; only unknown ids fall back to a prefix listing
+    entry = find_indexed_video(video_id)
+    if entry is None and reload_s3_url_index():
+        entry = find_indexed_video(video_id)
+    if entry:
+        return entry['url']
+
+    missed_at = missing_video_ids.get(video_id)
+    if missed_at is not None and time.time() - missed_at < MISSING_VIDEO_TTL_SECONDS:
+        return None
+
     try:
-        video_filename = video_id.split("_", 1)[1]
+        video_filename = s3_filename_from_video_id(video_id)
         prefix = f"videos-embed/{video_filename}"
         response = s3_client.list_objects_v2(
             Bucket=AWS_BUCKET_NAME,
@@ -213,27 +413,15 @@ def retrieve_single_s3_url_by_video_id(video_id, max_files=1):
         
         if 'Contents' not in response:
             print(f"No files found with prefix: {prefix}")
-            return []
+            missing_video_ids[video_id] = time.time()
+            return None
         
-        files = []
-        s3_urls = []
-        for obj in response['Contents']:
-            file_info = {
-                'key': obj['Key'],
-                'size': obj['Size'],
-                'last_modified': obj['LastModified'],
-                'url': f"https://{AWS_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{obj['Key']}"
-            }
-            files.append(file_info)
+        obj = response['Contents'][0]
+        print(f"Found {obj['Key']} ({obj['Size']} bytes) for {video_id}, adding to index")
+        index_uploaded_video(obj['Key'], obj['Size'], etag=obj['ETag'].strip('"'))
         
-        print(f"Found {len(files)} files:")
-        for file_info in files:
-            print(f"  - {file_info['key']} ({file_info['size']} bytes)")
-            print(f"    URL: {file_info['url']}")
-            s3_urls.append(file_info['url'])
-        
-        return s3_urls[0] if s3_urls else None
+        return s3_object_url(obj['Key'])
         
     except ClientError as e:
         print(f"Error listing S3 files: {str(e)}")
-        raise
\ No newline at end of file
+        raise
@@ -14,18 +14,48 @@ Then it will return an array of centroids.
 
 import faiss                   # make faiss available, and gpu can be enabled later
 import numpy as np
-from ai.tech_stack.qdrant import retrieve_all_from_qdrant, CENTROID_COLLECTION_NAME, retrieve_single_from_qdrant
+from ai.tech_stack.qdrant import retrieve_all_from_qdrant, CENTROID_COLLECTION_NAME, retrieve_single_from_qdrant, VECTOR_QUANTIZATION, normalize_vectors
 ncentroids = 4 # the number of centroids
 
 niter = 20
 verbose = True
 
+# cosine similarity at or above which a video counts as a duplicate (squared l2 distance <= 0.2 between unit vectors)
+DUPLICATE_SIMILARITY_THRESHOLD = 0.9
+
+# Compact mode stores index vectors as fp16 or 8-bit codes instead of float32 (see VECTOR_QUANTIZATION in qdrant.py)
+SCALAR_QUANTIZER_TYPES = {"fp16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}
+ADD_CHUNK_SIZE = 10_000
+TRAIN_SAMPLE_SIZE = 100_000
+
+def build_ip_index(vectors, quantization=VECTOR_QUANTIZATION):
+    """
+    Build an inner-product index over vectors: IndexFlatIP, or IndexScalarQuantizer (SQfp16 / SQ8) in compact mode.
+
+    Stored vectors are unit-normalized, so inner products are cosine similarities.
+
+    Vectors are converted to float32 in chunks while adding, so a float16 snapshot is never upcast
+    all at once.
+    """
+    d = vectors.shape[1]
+    if quantization in SCALAR_QUANTIZER_TYPES:
+        index = faiss.IndexScalarQuantizer(d, SCALAR_QUANTIZER_TYPES[quantization], faiss.METRIC_INNER_PRODUCT)
+        if not index.is_trained and len(vectors):
+            # SQ8 learns a per-dimension value range from a sample
+            index.train(np.ascontiguousarray(vectors[:TRAIN_SAMPLE_SIZE], dtype=np.float32))
+    else:
+        index = faiss.IndexFlatIP(d)
+
+    for start in range(0, len(vectors), ADD_CHUNK_SIZE):
+        index.add(np.ascontiguousarray(vectors[start:start + ADD_CHUNK_SIZE], dtype=np.float32))
+    return index
+
 def cluster_videos(vidembed, ncentroids=4, niter=20, verbose=True):
     """
     Clusters video embeddings using FAISS KMeans and assigns each centroid to its nearest video embedding.
 
     Args:
-        vidembed (np.ndarray): 2D numpy array of shape (nb, 2048) containing video embeddings.
+        vidembed (np.ndarray): 2D numpy array of shape (nb, 2048) containing unit-normalized video embeddings.
         ncentroids (int): Number of centroids/clusters to form.
         niter (int): Number of iterations for KMeans training.
         verbose (bool): If True, prints FAISS KMeans training progress.
@@ -34,17 +64,14 @@ def cluster_videos(vidembed, ncentroids=4, niter=20, verbose=True):
         List[Tuple[np.ndarray, np.ndarray]]: List of tuples, each containing a centroid embedding and its nearest video embedding.
     """
 
-    #since we are going to use l2distance for similarity, the input needs to be l2 normalized
-    vidembed = vidembed / np.linalg.norm(vidembed, axis=1, keepdims=True)
-
+    # embeddings from Qdrant are already unit-normalized, so no per-call normalization is needed
     d = vidembed.shape[1]
     kmeans = faiss.Kmeans(d, ncentroids, niter=niter, verbose=verbose)
     kmeans.train(vidembed)
 
     centroids = kmeans.centroids
 
-    vidind = faiss.IndexFlatL2(d)
-    vidind.add(vidembed)
+    vidind = build_ip_index(vidembed) # nearest video to a centroid by cosine similarity
 
     centroid_categories = []
     for centroid in centroids:
@@ -54,12 +81,13 @@ def cluster_videos(vidembed, ncentroids=4, niter=20, verbose=True):
     return centroid_categories
 
 
-def categorize_video(vidquery, centroids, k=3):
+def categorize_video(vidquery, centroids, k=3, centroid_index=None):
     '''
     for each video in vidquery, find k most similar centroids to it, where the precalculated centroid is given by centroids
     Args:
         vidquery (np.ndarray): 2D numpy array of shape (nb, 2048) containing video query embeddings.
-        centroids (np.ndarray): 2D numpy array of shape (ncentroids, 2048) containing centroid embeddings.
+        centroids (np.ndarray): 2D numpy array of shape (ncentroids, 2048) containing unit-normalized centroid embeddings.
+        centroid_index (faiss.Index): Optional prebuilt inner-product index over centroids, e.g. the published one.
     Returns: List[Tuple((centroid_embedding1,cosine similarity1), (centroid_embedding2, cosine similarity2), (centroid_embedding3, cosine similarity3))]
     eg for 1 video [((centroid_embedding1, cosine similarity1), (centroid_embedding2, cosine similarity2), (centroid_embedding3, cosine similarity3))]
     note that the video embedding corresponds to vidquery is NOT returned.
@@ -67,20 +95,16 @@ def categorize_video(vidquery, centroids, k=3):
 
     #creates the centroid ndarray of dimension ncentroids * 2048
     print("Centroids shape:", centroids.shape)
-    #since we are going to use l2distance for similarity, the input needs to be l2 normalized
-    vidquery = vidquery.reshape(-1, 2048)
-    vidquery = vidquery / np.linalg.norm(vidquery, axis=1, keepdims=True)
-    centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+    #inner product of unit vectors is the cosine similarity; only the query needs normalizing
+    vidquery = normalize_vectors(vidquery.reshape(-1, 2048))
     print("vidquery shape:", vidquery.shape)
 
     #create an index for the centroids, not the vidquery
-    centroid_index = faiss.IndexFlatL2(centroids.shape[1])
+    if centroid_index is None:
+        centroid_index = faiss.IndexFlatIP(centroids.shape[1])
+        centroid_index.add(np.ascontiguousarray(centroids, dtype=np.float32))
     print(centroid_index.is_trained)
-    centroid_index.add(centroids)
-    dist, ind = centroid_index.search(vidquery, k) # (squared)l2distance, and  index for each query
-
-    #convert distance to cosine similarity since the vectors are l2 normalized
-    cossim = 1 - dist / 2
+    cossim, ind = centroid_index.search(vidquery, k) # cosine similarity, and  index for each query
     print("cossim shape:", cossim.shape)
     # create a list to hold the results
     similar_centroids = []
@@ -0,0 +1,256 @@
+'''
+Versioned FAISS index artifacts shared by every server worker.
+
+An index is published as a set of files per version: the FAISS index written with
+faiss.write_index, the unit-normalized vectors it was built from as .npy and, optionally,
+the id of each row (video_id or category) as .ids.npy. A small
+<name>.current pointer file names the live version and is replaced atomically, so readers
+never see a half-written index.
+
+Readers open the index with IO_FLAG_MMAP and the vectors with np.load(mmap_mode='r'), so
+all worker processes on a host share one copy through the OS page cache and start without
+downloading the catalog from Qdrant. get_index() checks the pointer on every call and swaps
+to a newly published version in place; searches already running keep the version they started with.
+
+Videos stored after an index was built are added with append_to_index(), which publishes the
+current version plus the new rows. Each append rewrites the index files, so bulk runs append once per batch.
+
+Rebuild from Qdrant and publish from the repo root:
+    python -m ai.tech_stack.faiss_index_store --rebuild all
+'''
+import os
+import time
+import fcntl
+import argparse
+import threading
+from contextlib import contextmanager
+import faiss
+import numpy as np
+
+INDEX_DIR = os.getenv("FAISS_INDEX_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_indexes"))
+KEEP_VERSIONS = 2  # older versions may still be mapped by workers that have not swapped yet
+
+VIDEO_INDEX = "videos"
+CENTROID_INDEX = "centroids"
+SEGMENT_INDEX = "segments"
+
+# The segment index holds ~10x more vectors than the video index; above this size it is an IVF
+# index probing a few lists, which keeps segment search latency close to whole-video search
+SEGMENT_IVF_MIN_VECTORS = 100_000
+SEGMENT_IVF_NPROBE = 16
+
+# Index files are mapped rather than read into each process's heap where FAISS supports it.
+# IVF inverted lists are mapped through OnDiskInvertedLists, which IO_FLAG_MMAP_IFC does not support
+MMAP_FLAGS = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+IVF_MMAP_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+
+class LoadedIndex:
+    def __init__(self, version, index, vectors, ids=None):
+        self.version = version
+        self.index = index
+        self.vectors = vectors
+        self.ids = ids
+
+_loaded_indexes = {}
+_index_lock = threading.Lock()
+
+def pointer_path(name):
+    return os.path.join(INDEX_DIR, f"{name}.current")
+
+def version_paths(name, version):
+    base = os.path.join(INDEX_DIR, f"{name}.{version}")
+    return base + ".faiss", base + ".npy", base + ".ids.npy"
+
+def current_version(name):
+    try:
+        with open(pointer_path(name), 'r') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+# Function to write a new version of an index and make it live
+def publish_index(name, index, vectors, ids=None):
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    # One clock reading in UTC, so versions sort in publish order (local time repeats after a DST fall-back)
+    now_ns = time.time_ns()
+    version = f"v{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now_ns // 1_000_000_000))}{now_ns % 1_000_000_000:09d}"
+    index_path, vectors_path, ids_path = version_paths(name, version)
+
+    # Write under temporary names first so a crash never leaves a truncated version behind
+    tmp_suffix = f".{os.getpid()}.tmp"
+    faiss.write_index(index, index_path + tmp_suffix)
+    os.replace(index_path + tmp_suffix, index_path)
+    with open(vectors_path + tmp_suffix, 'wb') as f:
+        np.save(f, vectors)
+    os.replace(vectors_path + tmp_suffix, vectors_path)
+    if ids is not None:
+        with open(ids_path + tmp_suffix, 'wb') as f:
+            np.save(f, np.asarray([str(i) for i in ids]))
+        os.replace(ids_path + tmp_suffix, ids_path)
+
+    with open(pointer_path(name) + tmp_suffix, 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_path(name) + tmp_suffix, pointer_path(name))
+    print(f"Published {name} index {version} ({index.ntotal} vectors)")
+
+    prune_versions(name)
+    return version
+
+def prune_versions(name, keep=KEEP_VERSIONS):
+    versions = sorted(
+        file[len(name) + 1:-len(".faiss")] for file in os.listdir(INDEX_DIR)
+        if file.startswith(name + ".v") and file.endswith(".faiss")
+    )
+    live = current_version(name)
+    for version in versions[:-keep]:
+        if version == live:
+            continue  # never remove the version the pointer names
+        for path in version_paths(name, version):
+            # Unlinking a mapped file is safe: processes still using it keep their mapping
+            if os.path.exists(path):
+                os.remove(path)
+
+def mmap_flags(index_path):
+    # Every IVF index type is written with a fourcc starting with "Iw" (IwFl, IwSQ, IwPQ, ...)
+    with open(index_path, 'rb') as f:
+        fourcc = f.read(4)
+    return IVF_MMAP_FLAGS if fourcc.startswith(b"Iw") else MMAP_FLAGS
+
+def load_version(name, version):
+    index_path, vectors_path, ids_path = version_paths(name, version)
+    index = faiss.read_index(index_path, mmap_flags(index_path))
+    vectors = np.load(vectors_path, mmap_mode='r')
+    ids = np.load(ids_path, mmap_mode='r') if os.path.exists(ids_path) else None
+    print(f"Loaded {name} index {version} ({index.ntotal} vectors, memory-mapped)")
+    return LoadedIndex(version, index, vectors, ids)
+
+# Serializes the processes on a host that build or extend the same index
+@contextmanager
+def publish_lock(name):
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    with open(os.path.join(INDEX_DIR, f"{name}.lock"), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+# Function to get the live version of an index, swapping to a newer one if it was published
+def get_index(name, build=None):
+    """
+    Return the LoadedIndex for name, or None if none is published and build is not given.
+
+    build() -> (index, vectors, ids) is called to create and publish the first version; a file lock
+    makes sure only one process on the host builds it while the others wait and load the result.
+    """
+    version = current_version(name)
+    if version is None and build is not None:
+        with publish_lock(name):
+            version = current_version(name)
+            if version is None:
+                version = publish_index(name, *build())
+    if version is None:
+        return None
+
+    with _index_lock:
+        loaded = _loaded_indexes.get(name)
+        if loaded is None or loaded.version != version:
+            _loaded_indexes[name] = load_version(name, version)
+        return _loaded_indexes[name]
+
+def build_video_index():
+    from ai.tech_stack.qdrant import retrieve_all_from_qdrant, VIDEO_COLLECTION_NAME, SNAPSHOT_DTYPE
+    from ai.tech_stack.faiss_algo import build_ip_index
+    vectors, video_ids = retrieve_all_from_qdrant(VIDEO_COLLECTION_NAME, dtype=SNAPSHOT_DTYPE, payload_key='video_id')
+    return build_ip_index(vectors), vectors, video_ids
+
+def build_centroid_index():
+    from ai.tech_stack.qdrant import retrieve_all_from_qdrant, CENTROID_COLLECTION_NAME
+    vectors, categories = retrieve_all_from_qdrant(CENTROID_COLLECTION_NAME, payload_key='category')
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    return index, vectors, categories
+
+def build_segment_index():
+    from ai.tech_stack.qdrant import retrieve_all_from_qdrant, SEGMENT_COLLECTION_NAME, SNAPSHOT_DTYPE
+    from ai.tech_stack.faiss_algo import build_ip_index, ADD_CHUNK_SIZE, TRAIN_SAMPLE_SIZE
+    vectors, video_ids = retrieve_all_from_qdrant(SEGMENT_COLLECTION_NAME, dtype=SNAPSHOT_DTYPE, payload_key='video_id')
+    if len(vectors) < SEGMENT_IVF_MIN_VECTORS:
+        return build_ip_index(vectors), vectors, video_ids
+
+    nlist = int(4 * np.sqrt(len(vectors)))
+    index = faiss.IndexIVFFlat(faiss.IndexFlatIP(vectors.shape[1]), vectors.shape[1], nlist, faiss.METRIC_INNER_PRODUCT)
+    sample = np.random.default_rng(0).choice(len(vectors), size=min(len(vectors), TRAIN_SAMPLE_SIZE), replace=False)
+    index.train(np.ascontiguousarray(vectors[np.sort(sample)], dtype=np.float32))
+    for start in range(0, len(vectors), ADD_CHUNK_SIZE):
+        index.add(np.ascontiguousarray(vectors[start:start + ADD_CHUNK_SIZE], dtype=np.float32))
+    index.nprobe = SEGMENT_IVF_NPROBE  # saved with the index
+    return index, vectors, video_ids
+
+INDEX_BUILDERS = {VIDEO_INDEX: build_video_index, CENTROID_INDEX: build_centroid_index, SEGMENT_INDEX: build_segment_index}
+
+# Function to rebuild an index from Qdrant and publish it as a new version
+def rebuild_index(name):
+    return publish_index(name, *INDEX_BUILDERS[name]())
+
+def needs_rebuild(name, index, ntotal):
+    # An empty SQ8 index was never trained, and a flat segment index past the IVF size is rebuilt as IVF
+    if not index.is_trained:
+        return True
+    return name == SEGMENT_INDEX and ntotal >= SEGMENT_IVF_MIN_VECTORS and not isinstance(index, faiss.IndexIVF)
+
+# Function to add newly stored rows to the live version of an index and publish the result
+def append_to_index(name, vectors, ids):
+    """
+    Publish the current version of name plus vectors (unit-normalized, one id per row), so searches
+    see videos stored after the index was built. Rows whose id is already in the index are skipped,
+    so storing a video again does not duplicate it.
+
+    Nothing is published while no version exists: the first get_index() builds from Qdrant, which
+    already holds the new rows. An index that cannot simply grow (see needs_rebuild) is rebuilt from Qdrant.
+
+    Returns:
+        str or None: The live version afterwards, or None if the index is not published yet.
+    """
+    ids = np.asarray([str(i) for i in ids])
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+    with publish_lock(name):
+        version = current_version(name)
+        if version is None or not len(ids):
+            return version
+
+        index_path, vectors_path, ids_path = version_paths(name, version)
+        if not os.path.exists(ids_path):
+            return rebuild_index(name)
+        stored_ids = np.load(ids_path)
+        new_rows = ~np.isin(ids, stored_ids)
+        if not new_rows.any():
+            return version
+
+        index = faiss.read_index(index_path)  # a private copy; the mapped live version stays read-only
+        if needs_rebuild(name, index, index.ntotal + int(new_rows.sum())):
+            return rebuild_index(name)
+
+        stored_vectors = np.load(vectors_path, mmap_mode='r')
+        index.add(np.ascontiguousarray(vectors[new_rows]))
+        return publish_index(
+            name, index,
+            np.concatenate([stored_vectors, vectors[new_rows].astype(stored_vectors.dtype)]),
+            np.concatenate([stored_ids, ids[new_rows]])
+        )
+
+def get_video_index():
+    return get_index(VIDEO_INDEX, build=build_video_index)
+
+def get_centroid_index():
+    return get_index(CENTROID_INDEX, build=build_centroid_index)
+
+def get_segment_index():
+    return get_index(SEGMENT_INDEX, build=build_segment_index)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild FAISS index artifacts from Qdrant")
+    parser.add_argument("--rebuild", choices=[*INDEX_BUILDERS, "all"], default="all")
+    args = parser.parse_args()
+
+    for name in (INDEX_BUILDERS if args.rebuild == "all" else [args.rebuild]):
+        rebuild_index(name)
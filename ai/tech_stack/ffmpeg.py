@@ -0,0 +1,76 @@
+'''
+Thin wrappers around the ffmpeg / ffprobe command line tools.
+
+Sources can be local paths or http(s) URLs (e.g. public S3 URLs); ffmpeg reads only the byte
+ranges it needs when seeking, so sampling a few frames does not download the whole video.
+Transcoding needs an ffmpeg build with libx264.
+'''
+import os
+import shutil
+import subprocess
+
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+FFPROBE_BIN = os.getenv("FFPROBE_BIN", "ffprobe")
+FFMPEG_TIMEOUT = 120  # seconds per command
+FFMPEG_TRANSCODE_TIMEOUT = 600
+
+def run(command, timeout=FFMPEG_TIMEOUT):
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(f"{command[0]} failed: {result.stderr.decode(errors='replace').strip()[-500:]}")
+    return result.stdout
+
+# Function to check that the ffmpeg and ffprobe binaries can be found
+def ffmpeg_available():
+    return all(shutil.which(binary) for binary in (FFMPEG_BIN, FFPROBE_BIN))
+
+# Function to get a video's duration in seconds
+def probe_duration(source):
+    output = run([FFPROBE_BIN, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", source])
+    return float(output.decode().strip())
+
+# Function to decode the frame shown at timestamp as raw 8-bit grayscale pixels
+def extract_gray_frame(source, timestamp, width, height):
+    """
+    The input is seeked to the keyframe before timestamp and decoded up to timestamp, so the
+    same frame is returned however the video was encoded (re-encodes move keyframes).
+
+    Returns:
+        bytes: width * height grayscale pixels, row-major.
+    """
+    frame = run([
+        FFMPEG_BIN, "-v", "error",
+        "-ss", f"{timestamp:.3f}", "-i", source,  # accurate seek: frames before timestamp are decoded and dropped
+        "-frames:v", "1", "-vf", f"scale={width}:{height},format=gray",
+        "-f", "rawvideo", "-"
+    ])
+    if len(frame) != width * height:
+        raise RuntimeError(f"Expected {width * height} pixels at {timestamp:.1f}s, got {len(frame)}")
+    return frame
+
+# Function to re-encode a video at low resolution/frame rate with a low-bitrate mono audio track
+def transcode_video(source, output_path, height, fps, keyframes_only=False):
+    """
+    Write a small H.264/AAC MP4 of source to output_path.
+
+    height is the output height in pixels (width keeps the aspect ratio) and fps caps the frame
+    rate. With keyframes_only=True only the source keyframes are decoded and kept at their original
+    timestamps (a keyframe strip), which is much faster than decoding every frame; audio is kept whole.
+    """
+    video_filter = f"scale=-2:'min({height},ih)'"  # never upscale
+    command = [FFMPEG_BIN, "-v", "error", "-y"]
+    if keyframes_only:
+        command += ["-skip_frame", "nokey"]  # decoder option, applies to the next input
+    else:
+        video_filter += f",fps={fps}"
+    command += [
+        "-i", source,
+        "-vf", video_filter,
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "28",
+        "-c:a", "aac", "-b:a", "64k", "-ac", "1",
+        "-movflags", "+faststart",
+    ]
+    if keyframes_only:
+        command += ["-fps_mode", "vfr"]
+    run(command + [output_path], timeout=FFMPEG_TRANSCODE_TIMEOUT)
+    return output_path
@@ -5,8 +5,9 @@ from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 from ai.tech_stack.aws import download_from_s3, cleanup_temp_file
+from ai.tech_stack.ffmpeg import transcode_video
 from ai.evaluate_video_quality.prompt import PROMPT
-from ai.evaluate_video_quality.schema import SCHEMA
+from ai.evaluate_video_quality.schema import SCHEMA, RUBRIC_KEYS
 
 load_dotenv()
 
@@ -15,6 +16,15 @@ GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini
 
 client = genai.Client(api_key=GEMINI_API_KEY)
 
+# Shrink videos locally before upload so upload time, Gemini processing and tokens stop scaling
+# with source bitrate: "none" uploads the original, "downscale" re-encodes at GEMINI_UPLOAD_HEIGHT
+# / GEMINI_UPLOAD_FPS, "keyframes" keeps only the source keyframes. Audio is kept in both modes.
+# Compare scores with the original first: python -m ai.scripts.benchmark_gemini_preprocessing
+GEMINI_PREPROCESS = os.getenv("GEMINI_PREPROCESS", "none")
+GEMINI_UPLOAD_HEIGHT = int(os.getenv("GEMINI_UPLOAD_HEIGHT", 360))
+GEMINI_UPLOAD_FPS = float(os.getenv("GEMINI_UPLOAD_FPS", 2))
+PREPROCESS_MODES = ("none", "downscale", "keyframes")
+
     
 def wait_for_file_active(uploaded_file, max_wait_time=300, check_interval=5):
     """
@@ -54,22 +64,59 @@ def wait_for_file_active(uploaded_file, max_wait_time=300, check_interval=5):
     print(f"Timeout: File did not become ACTIVE within {max_wait_time} seconds")
     return False
 
-def score_video_with_gemini(s3_video_url, prompt, max_wait_time=300, retries=3, delay=2):
+# Function to describe what a preprocess mode uploads, for cache keys of results computed from the upload
+def preprocess_signature(preprocess=GEMINI_PREPROCESS):
+    if preprocess == "downscale":
+        return f"downscale-{GEMINI_UPLOAD_HEIGHT}p-{GEMINI_UPLOAD_FPS:g}fps"
+    if preprocess == "keyframes":
+        return f"keyframes-{GEMINI_UPLOAD_HEIGHT}p"
+    return preprocess
+
+def preprocess_video(video_path, preprocess=GEMINI_PREPROCESS):
+    """
+    Write a smaller copy of the video for upload.
+
+    Returns:
+        str or None: Path of the preprocessed video, or None to upload the original (mode "none",
+                     or ffmpeg failed).
+    """
+    if preprocess not in PREPROCESS_MODES:
+        raise ValueError(f"Unknown GEMINI_PREPROCESS mode: {preprocess}")
+    if preprocess == "none":
+        return None
+
+    output_path = f"{os.path.splitext(video_path)[0]}.{preprocess}.mp4"
+    try:
+        start_time = time.time()
+        transcode_video(video_path, output_path, GEMINI_UPLOAD_HEIGHT, GEMINI_UPLOAD_FPS, keyframes_only=(preprocess == "keyframes"))
+        print(f"Preprocessed video ({preprocess}) in {time.time() - start_time:.1f}s: "
+              f"{os.path.getsize(video_path) / 1e6:.1f} MB -> {os.path.getsize(output_path) / 1e6:.1f} MB")
+        return output_path
+    except Exception as e:
+        print(f"Warning: Could not preprocess video, uploading the original: {str(e)}")
+        cleanup_temp_file(output_path)
+        return None
+
+def score_video_with_gemini(s3_video_url, prompt, max_wait_time=300, retries=3, delay=2, preprocess=GEMINI_PREPROCESS, schema=SCHEMA):
     """
     Download video from S3, analyze it with Gemini, and return the response.
     Retry generate_content if JSON parsing fails.
+    preprocess is one of PREPROCESS_MODES and picks what is uploaded (see GEMINI_PREPROCESS).
+    schema may add fields beyond the rubric (e.g. COMBINED_SCHEMA); only RUBRIC_KEYS are scored.
     """
     temp_file_path = None
+    preprocessed_path = None
     uploaded_file = None
 
     try:
         # Step 1: Download video from S3
         print(f"Starting download from S3: {s3_video_url}")
         temp_file_path = download_from_s3(s3_video_url)
+        preprocessed_path = preprocess_video(temp_file_path, preprocess)
 
         # Step 2: Upload to Gemini
         print("Uploading video to Gemini for analysis...")
-        uploaded_file = client.files.upload(file=temp_file_path)
+        uploaded_file = client.files.upload(file=preprocessed_path or temp_file_path)
         print(f"Uploaded to Gemini with URI: {uploaded_file.uri}")
 
         # Step 3: Wait for file to become ACTIVE
@@ -77,8 +124,8 @@ def score_video_with_gemini(s3_video_url, prompt, max_wait_time=300, retries=3,
             raise Exception("File did not become ACTIVE within the specified timeout")
 
         generation_config = {}
-        if SCHEMA:
-            generation_config['response_schema'] = SCHEMA
+        if schema:
+            generation_config['response_schema'] = schema
             generation_config['response_mime_type'] = 'application/json'
 
         # Step 4: Generate content with retries
@@ -96,7 +143,7 @@ def score_video_with_gemini(s3_video_url, prompt, max_wait_time=300, retries=3,
                 evaluation_data = json.loads(response_text)
                 
                 # Compute total and normalized scores
-                total_score = sum(int(evaluation_data[key]['score']) for key in evaluation_data)
+                total_score = sum(int(evaluation_data[key]['score']) for key in RUBRIC_KEYS)
                 normalized_score = total_score / 25.0
                 evaluation_data['total_score'] = total_score
                 evaluation_data['normalized_score'] = normalized_score
@@ -120,6 +167,8 @@ def score_video_with_gemini(s3_video_url, prompt, max_wait_time=300, retries=3,
     finally:
         if temp_file_path:
             cleanup_temp_file(temp_file_path)
+        if preprocessed_path:
+            cleanup_temp_file(preprocessed_path)
         if uploaded_file:
             try:
                 client.files.delete(name=uploaded_file.name)
@@ -0,0 +1,226 @@
+'''
+Local background job queue for long-running admin operations.
+
+Jobs are persisted in a SQLite database so they survive restarts and can be shared by every
+server worker process on the host. Each process runs a small pool of worker threads that claim
+queued jobs, run the registered handler and store its progress and JSON result.
+
+A claimed job holds a lease that its worker renews every few seconds while the handler runs. If
+the process dies (including a container restart, where PIDs are reused) the lease expires and
+the next free worker on any process reclaims the job.
+
+Submitting a job whose type and params match a job that is still queued or running returns the
+existing job id instead of queueing a duplicate.
+'''
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+POLL_INTERVAL = 1.0
+LEASE_SECONDS = 60  # a running job not renewed for this long is reclaimed
+HEARTBEAT_INTERVAL = LEASE_SECONDS / 4
+ERROR_RETRY_INTERVAL = 5.0  # pause after a queue error (e.g. database is locked) before trying again
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# job_type -> handler(params, report_progress) returning a JSON-serializable result
+job_handlers = {}
+
+_workers_pid = None
+_workers_lock = threading.Lock()
+_job_available = threading.Event()
+
+# Function to register a handler for a job type
+def register_job(job_type, handler):
+    job_handlers[job_type] = handler
+
+def connect():
+    connection = sqlite3.connect(JOB_DB_PATH, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+def init_job_db():
+    with closing(connect()) as connection:
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                job_type TEXT NOT NULL,
+                dedupe_key TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT,
+                result TEXT,
+                error TEXT,
+                worker_pid INTEGER,
+                lease_expires_at REAL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+        if "lease_expires_at" not in columns:  # databases created before job leases
+            connection.execute("ALTER TABLE jobs ADD COLUMN lease_expires_at REAL")
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe_key ON jobs (dedupe_key, status)")
+
+def now():
+    return datetime.now(timezone.utc).isoformat()
+
+def job_to_dict(row):
+    return {
+        "job_id": row["id"],
+        "job_type": row["job_type"],
+        "params": json.loads(row["params"]),
+        "status": row["status"],
+        "progress": row["progress"],
+        "message": row["message"],
+        "result": json.loads(row["result"]) if row["result"] is not None else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+# Function to submit a job, coalescing with an identical queued/running job
+def submit_job(job_type, params):
+    """
+    Queue a job and return its id.
+
+    Returns:
+        tuple: (job_id, created) where created is False if an identical job was already pending.
+    """
+    if job_type not in job_handlers:
+        raise ValueError(f"Unknown job type: {job_type}")
+
+    params_json = json.dumps(params, sort_keys=True)
+    dedupe_key = hashlib.sha256(f"{job_type}:{params_json}".encode()).hexdigest()
+
+    ensure_job_workers()
+    with closing(connect()) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            existing = connection.execute(
+                "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                (dedupe_key, QUEUED, RUNNING)
+            ).fetchone()
+            if existing:
+                connection.execute("COMMIT")
+                print(f"Coalesced {job_type} submission into job {existing['id']}")
+                return existing["id"], False
+
+            job_id = uuid.uuid4().hex
+            timestamp = now()
+            connection.execute(
+                "INSERT INTO jobs (id, job_type, dedupe_key, params, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, job_type, dedupe_key, params_json, QUEUED, timestamp, timestamp)
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    _job_available.set()
+    print(f"Queued {job_type} job {job_id}")
+    return job_id, True
+
+# Function to get a job's status, progress and result
+def get_job(job_id):
+    with closing(connect()) as connection:
+        row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return job_to_dict(row) if row else None
+
+def update_job(job_id, **fields):
+    fields["updated_at"] = now()
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    with closing(connect()) as connection:
+        connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+def claim_next_job():
+    # Queued jobs, and running jobs whose worker stopped renewing the lease
+    with closing(connect()) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE status = ? OR (status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)) "
+                "ORDER BY created_at LIMIT 1", (QUEUED, RUNNING, time.time())
+            ).fetchone()
+            if row:
+                if row["status"] == RUNNING:
+                    print(f"Reclaiming job {row['id']} whose lease expired")
+                connection.execute(
+                    "UPDATE jobs SET status = ?, worker_pid = ?, lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, os.getpid(), time.time() + LEASE_SECONDS, now(), row["id"])
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+    return row
+
+def renew_lease(job_id, stop):
+    # A failed renewal is retried at the next beat; the lease only lapses if renewals keep failing
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            update_job(job_id, lease_expires_at=time.time() + LEASE_SECONDS)
+        except Exception as e:
+            print(f"Could not renew the lease of job {job_id}: {str(e)}")
+
+def run_job(row):
+    job_id = row["id"]
+
+    def report_progress(progress, message=None):
+        update_job(job_id, progress=float(progress), message=message)
+
+    stop_heartbeat = threading.Event()
+    threading.Thread(target=renew_lease, args=(job_id, stop_heartbeat), name=f"job-lease-{job_id}", daemon=True).start()
+    try:
+        print(f"Running {row['job_type']} job {job_id}...")
+        result = job_handlers[row["job_type"]](json.loads(row["params"]), report_progress)
+        update_job(job_id, status=SUCCEEDED, progress=1.0, result=json.dumps(result))
+        print(f"Job {job_id} succeeded")
+    except Exception as e:
+        update_job(job_id, status=FAILED, error=str(e))
+        print(f"Job {job_id} failed: {str(e)}")
+    finally:
+        stop_heartbeat.set()
+
+def worker_loop():
+    while True:
+        try:
+            row = claim_next_job()
+            if row is None:
+                _job_available.wait(POLL_INTERVAL)
+                _job_available.clear()
+                continue
+            if row["job_type"] not in job_handlers:
+                update_job(row["id"], status=FAILED, error=f"No handler registered for {row['job_type']}")
+                continue
+            run_job(row)
+        except Exception as e:
+            # A job whose outcome could not be stored keeps its lease until it lapses, then it is retried
+            print(f"Job worker error: {str(e)}")
+            time.sleep(ERROR_RETRY_INTERVAL)
+
+# Function to start this process's worker threads (safe to call repeatedly and after fork)
+def ensure_job_workers(n_workers=JOB_WORKERS):
+    global _workers_pid
+    with _workers_lock:
+        if _workers_pid == os.getpid():
+            return
+        init_job_db()
+        for i in range(n_workers):
+            threading.Thread(target=worker_loop, name=f"job-worker-{i}", daemon=True).start()
+        _workers_pid = os.getpid()
+        print(f"Started {n_workers} job workers in process {os.getpid()}")
@@ -2,7 +2,8 @@ import os
 import uuid
 import numpy as np
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
+from qdrant_client.models import (Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue,
+                                  Datatype, ScalarQuantization, ScalarQuantizationConfig, ScalarType)
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,29 +11,64 @@ load_dotenv()
 # Qdrant Configuration
 VIDEO_COLLECTION_NAME = "video_embeddings"
 CENTROID_COLLECTION_NAME = "centroid_embeddings"
+SEGMENT_COLLECTION_NAME = "segment_embeddings"  # one point per clip segment of each stored video
 VECTOR_SIZE = 2048
 
+# Opt-in compact vector storage (default "none" keeps float32 everywhere):
+#   "fp16" - collections store float16 vectors and local snapshots are float16
+#   "int8" - collections keep float32 originals on disk and search an int8 scalar-quantized copy
+#            in RAM (Qdrant rescores with the originals); local snapshots are float16
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+SNAPSHOT_DTYPE = np.float16 if VECTOR_QUANTIZATION in ("fp16", "int8") else np.float32
+
+# Function to create a qdrant client (also used to reconnect in forked server workers)
+def create_qdrant_client():
+    return QdrantClient(
+        url=os.getenv("QDRANT_ENDPOINT_URL"),
+        api_key=os.getenv("QDRANT_API_KEY"),
+        timeout=20,
+        prefer_grpc=False
+    )
+
 # Initialize Qdrant client
-qdrant_client = QdrantClient(
-    url=os.getenv("QDRANT_ENDPOINT_URL"),
-    api_key=os.getenv("QDRANT_API_KEY"),
-    timeout=20,
-    prefer_grpc=False
-)
+qdrant_client = create_qdrant_client()
+
+# Function to scale vectors to unit length; vectors are stored normalized so search can use inner product
+def normalize_vectors(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def vector_params():
+    if VECTOR_QUANTIZATION == "fp16":
+        return VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE, datatype=Datatype.FLOAT16)
+    if VECTOR_QUANTIZATION == "int8":
+        return VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE, on_disk=True)
+    return VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE)
+
+def quantization_config():
+    if VECTOR_QUANTIZATION == "int8":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+    return None
 
 # Function to create qdrant collection if not exists
 def create_collection_if_not_exists(collection_name):
     if not qdrant_client.collection_exists(collection_name):
         qdrant_client.create_collection(
             collection_name=collection_name,
-            vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE)
+            vectors_config=vector_params(),
+            quantization_config=quantization_config()
         )
         print(f"✅ Created collection: {collection_name}")
     else:
         print(f"⚡ Collection already exists: {collection_name}")
+        if VECTOR_QUANTIZATION == "int8":
+            # Quantization can be added to an existing collection; the stored datatype cannot be changed
+            qdrant_client.update_collection(collection_name=collection_name, quantization_config=quantization_config())
         
 create_collection_if_not_exists(VIDEO_COLLECTION_NAME)
 create_collection_if_not_exists(CENTROID_COLLECTION_NAME)
+create_collection_if_not_exists(SEGMENT_COLLECTION_NAME)
 
 # Function to store embed video in qdrant
 def store_video_in_qdrant(video_embedding, video_id, s3_url):
@@ -45,8 +81,9 @@ def store_video_in_qdrant(video_embedding, video_id, s3_url):
         # Create a unique point structure for Qdrant storage
         point = PointStruct(
             id=uuid.uuid4().int & ((1<<64)-1), # Generate a unique 64-bit integer ID
-            vector=video_embedding, # Store the extracted embedding vector
+            vector=normalize_vectors(video_embedding).tolist(), # Store the extracted embedding vector, unit-normalized
             payload={
+                'normalized': True,
                 'video_id': video_id,
                 'video_url': s3_url,  # Store the public S3 URL of the video
             }
@@ -59,6 +96,38 @@ def store_video_in_qdrant(video_embedding, video_id, s3_url):
         print(f"Error storing in Qdrant: {str(e)}")
         raise
 
+# Function to store the clip segment embeddings of a video in qdrant
+def store_segments_in_qdrant(segment_embeddings, segment_offsets, video_id, s3_url):
+    if not qdrant_client:
+        raise ValueError("Qdrant client not configured")
+
+    try:
+        print(f"Storing {len(segment_embeddings)} segment embeddings for {video_id}...")
+
+        points = [
+            PointStruct(
+                id=uuid.uuid4().int & ((1<<64)-1), # Generate a unique 64-bit integer ID
+                vector=segment_embedding.tolist(),
+                payload={
+                    'normalized': True,
+                    'video_id': video_id,
+                    'video_url': s3_url,
+                    'segment_index': i,
+                    'start_offset_sec': start_offset_sec,
+                    'end_offset_sec': end_offset_sec,
+                }
+            )
+            for i, (segment_embedding, (start_offset_sec, end_offset_sec))
+            in enumerate(zip(normalize_vectors(segment_embeddings), segment_offsets))
+        ]
+
+        # Insert all segments of the video in one request
+        qdrant_client.upsert(collection_name=SEGMENT_COLLECTION_NAME, points=points)
+        print("Stored segment embeddings in Qdrant")
+    except Exception as e:
+        print(f"Error storing in Qdrant: {str(e)}")
+        raise
+
 # Function to store centroid(category) in qdrant
 def store_category_in_qdrant(centroid_embedding, category):
     if not qdrant_client:
@@ -70,8 +139,9 @@ def store_category_in_qdrant(centroid_embedding, category):
         # Create a unique point structure for Qdrant storage
         point = PointStruct(
             id=uuid.uuid4().int & ((1<<64)-1), # Generate a unique 64-bit integer ID
-            vector=centroid_embedding, # Store the extracted embedding vector
+            vector=normalize_vectors(centroid_embedding).tolist(), # Store the extracted embedding vector, unit-normalized
             payload={
+                'normalized': True,
                 'category': category
             }
         )
@@ -113,14 +183,23 @@ def retrieve_single_from_qdrant(collection_name, point_id):
         raise
     
 # Function to retrieve all embeddings from a qdrant collection
-def retrieve_all_from_qdrant(collection_name):
+def retrieve_all_from_qdrant(collection_name, dtype=np.float32, payload_key=None):
+    """
+    Retrieve every vector in a collection as one (n, VECTOR_SIZE) array of unit-normalized rows.
+
+    Pass dtype=SNAPSHOT_DTYPE for long-lived local snapshots so compact mode keeps them in float16.
+    With payload_key (e.g. 'video_id') returns (vectors, values) with that payload field per row.
+    """
     if not qdrant_client:
         raise ValueError("Qdrant client not configured")
 
     try:
         print(f"Retrieving all video embeddings...")
 
-        all_vectors = []
+        # Fill a preallocated array instead of collecting per-point float32 copies
+        all_vectors = np.empty((qdrant_client.count(collection_name=collection_name, exact=True).count, VECTOR_SIZE), dtype=dtype)
+        n_vectors = 0
+        payload_values = []
 
         # Iterate through all points in the collection
         # The scroll method returns points and a next_page_offset for pagination
@@ -131,20 +210,27 @@ def retrieve_all_from_qdrant(collection_name):
                 limit=100,  # Adjust limit as needed for performance
                 offset=next_page_offset,
                 with_vectors=True,
-                with_payload=True # Include payload if desired
+                with_payload=[payload_key] if payload_key else False
             )
             if not points:
                 break # No more points to retrieve
 
-            for point in points:
-                vector_embedding = np.array(point.vector, dtype=np.float32)
-                all_vectors.append(vector_embedding) # Access the vector embedding
+            if n_vectors + len(points) > len(all_vectors):
+                # Points were added since counting; grow the buffer
+                all_vectors = np.concatenate([all_vectors, np.empty((max(len(points), len(all_vectors)), VECTOR_SIZE), dtype=dtype)])
+            # Points written before vectors were normalized at write time are normalized here, once per load
+            all_vectors[n_vectors:n_vectors + len(points)] = normalize_vectors([point.vector for point in points])
+            n_vectors += len(points)
+            if payload_key:
+                payload_values.extend((point.payload or {}).get(payload_key) for point in points)
 
             if next_page_offset is None:
                 break # Reached the end of the collection
 
-        print(f"Retrieved {len(all_vectors)} vector embeddings.")
-        return np.array(all_vectors, dtype=np.float32)
+        print(f"Retrieved {n_vectors} vector embeddings.")
+        if payload_key:
+            return all_vectors[:n_vectors], payload_values
+        return all_vectors[:n_vectors]
     except Exception as e:
         print(f"Error retrieving all from Qdrant: {str(e)}")
         raise
@@ -250,10 +336,10 @@ def retrieve_all_video_ids():
         while True:
             points, next_page_offset = qdrant_client.scroll(
                 collection_name=VIDEO_COLLECTION_NAME,
-                limit=100,  # Adjust limit as needed for performance
+                limit=1000,  # Adjust limit as needed for performance
                 offset=next_page_offset,
                 with_vectors=False,
-                with_payload=True # Include payload to get video_id
+                with_payload=["video_id"] # Only fetch the video_id field of the payload
             )
             if not points:
                 break # No more points to retrieve
@@ -271,6 +357,40 @@ def retrieve_all_video_ids():
         print(f"Error retrieving all video IDs from Qdrant: {str(e)}")
         raise
 
+# Function to retrieve (video_id, video_url) of every stored video
+def retrieve_all_video_urls():
+    if not qdrant_client:
+        raise ValueError("Qdrant client not configured")
+
+    try:
+        print("Retrieving all video URLs...")
+
+        video_urls = []
+        next_page_offset = None
+        while True:
+            points, next_page_offset = qdrant_client.scroll(
+                collection_name=VIDEO_COLLECTION_NAME,
+                limit=1000,
+                offset=next_page_offset,
+                with_vectors=False,
+                with_payload=["video_id", "video_url"]
+            )
+            if not points:
+                break
+
+            for point in points:
+                if 'video_id' in point.payload and 'video_url' in point.payload:
+                    video_urls.append((point.payload['video_id'], point.payload['video_url']))
+
+            if next_page_offset is None:
+                break
+
+        print(f"Retrieved {len(video_urls)} video URLs.")
+        return video_urls
+    except Exception as e:
+        print(f"Error retrieving all video URLs from Qdrant: {str(e)}")
+        raise
+
 # Function to delete all vectors from a qdrant collection
 def delete_all_vectors(collection_name=CENTROID_COLLECTION_NAME):
     if not qdrant_client:
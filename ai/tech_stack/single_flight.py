@@ -0,0 +1,54 @@
+'''
+Single-flight request coalescing.
+
+Wrapping a function with @single_flight makes concurrent calls with the same key (the first
+positional argument) share one in-flight computation: the first caller runs the function and
+every caller that arrives while it is running waits for and receives the same result or
+exception. Once the call finishes the key is released, so later calls run fresh.
+
+Coalescing is per process; with several server workers each process runs at most one call per key.
+'''
+import functools
+import threading
+
+class InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+def single_flight(func):
+    in_flight = {}
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(key, *args, **kwargs):
+        with lock:
+            call = in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = InFlightCall()
+                in_flight[key] = call
+
+        if not is_leader:
+            print(f"Joining in-flight {func.__name__} call for {key}")
+            return call.wait()
+
+        try:
+            call.result = func(key, *args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with lock:
+                in_flight.pop(key, None)
+            call.done.set()
+
+    return wrapper
@@ -6,7 +6,8 @@ from twelvelabs.types import VideoSegment
 from twelvelabs.embed import TasksStatusResponse
 from twelvelabs.indexes import IndexesCreateRequestModelsItem
 from twelvelabs.tasks import TasksRetrieveResponse
-from ai.embed_video.prepare_embedding import prepare_embedding
+from ai.embed_video.prepare_embedding import prepare_embedding, prepare_segment_embeddings
+from ai.tech_stack.single_flight import single_flight
 import time
 from dotenv import load_dotenv
 
@@ -15,8 +16,12 @@ load_dotenv()
 # Twelve Labs Configuration
 INDEX_NAME = "centroid-video-embeddings-index"
 
+# Function to create a Twelve Labs client (also used to reconnect in forked server workers)
+def create_twelvelabs_client():
+    return TwelveLabs(api_key=os.getenv("TL_API_KEY"))
+
 # Initialize Twelve Labs client
-twelvelabs_client = TwelveLabs(api_key=os.getenv("TL_API_KEY"))
+twelvelabs_client = create_twelvelabs_client()
 
 def get_or_create_index(index_name="centroid-video-embeddings-index"):
     # 1. Check if index already exists
@@ -40,8 +45,9 @@ def get_or_create_index(index_name="centroid-video-embeddings-index"):
 
 index = get_or_create_index(INDEX_NAME)
 
-# Function to fetch video embeddings 
-def create_video_embedding(video_url, max_retries=3, retry_delay=5):
+# Function to fetch the clip-scope segments of a video from a Marengo embedding task
+@single_flight  # concurrent requests for the same video_url share one embedding task
+def fetch_clip_segments(video_url, max_retries=3, retry_delay=5):
     if not twelvelabs_client:
         raise ValueError("Twelve Labs API key not configured")
 
@@ -92,10 +98,7 @@ def create_video_embedding(video_url, max_retries=3, retry_delay=5):
             else:
                 raise ValueError("No embeddings found in the response")
 
-            # Prepare embedding from video segments
-            video_embedding = prepare_embedding(video_segments)
-
-            return video_embedding
+            return video_segments
 
         except Exception as e:
             print(f"Error creating embedding (attempt {retries+1}): {str(e)}")
@@ -108,6 +111,21 @@ def create_video_embedding(video_url, max_retries=3, retry_delay=5):
                 print("Max retries reached, giving up.")
                 raise
 
+# Function to fetch video embeddings 
+def create_video_embedding(video_url, max_retries=3, retry_delay=5):
+    # Prepare embedding from video segments
+    return prepare_embedding(fetch_clip_segments(video_url, max_retries, retry_delay))
+
+# Function to fetch the whole-video embedding and the per-segment embeddings from one embedding task
+def create_video_and_segment_embeddings(video_url, max_retries=3, retry_delay=5):
+    """
+    Returns:
+        tuple: (video_embedding, segment_embeddings, segment_offsets)
+    """
+    video_segments = fetch_clip_segments(video_url, max_retries, retry_delay)
+    segment_embeddings, segment_offsets = prepare_segment_embeddings(video_segments)
+    return prepare_embedding(video_segments), segment_embeddings, segment_offsets
+
 # Function to categorize video using Twelve Labs
 def categorize_video(video_url):
     # 1. Upload a video
@@ -0,0 +1,132 @@
+'''
+Learned dimensionality reduction for embedding search.
+
+A PCA or OPQ projection trained on the catalog maps the 2048-d visual+audio vectors to 256 or
+512 dims. Candidates are searched in the reduced space, then re-ranked with exact distances on
+the full-precision vectors, so the final similarities (and the duplicate threshold applied to
+them) are the same as a full search whenever the true neighbors are among the candidates.
+
+Train and save the projection from the repo root:
+    python -m ai.tech_stack.vector_projection --dim 256 --method pca
+Search uses it automatically once the artifact exists.
+'''
+import os
+import argparse
+import threading
+import faiss
+import numpy as np
+
+PROJECTION_PATH = os.getenv("VECTOR_PROJECTION_PATH", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bot_content_detection", "models", "vector_projection.faiss"))
+DEFAULT_REDUCED_DIM = 256
+RERANK_FACTOR = 10  # candidates fetched from the reduced index per requested neighbor
+CHUNK_SIZE = 10_000
+TRAIN_SAMPLE_SIZE = 100_000
+
+_projection = None
+_projection_mtime = None
+_projection_lock = threading.Lock()
+
+def normalize(vectors):
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+# Function to train a PCA or OPQ projection on (a sample of) the catalog
+def train_projection(vectors, d_out=DEFAULT_REDUCED_DIM, method="pca", seed=0):
+    d = vectors.shape[1]
+    rng = np.random.default_rng(seed)
+    sample = vectors if len(vectors) <= TRAIN_SAMPLE_SIZE else vectors[np.sort(rng.choice(len(vectors), TRAIN_SAMPLE_SIZE, replace=False))]
+    sample = normalize(sample)
+
+    if method == "pca":
+        projection = faiss.PCAMatrix(d, d_out)
+    elif method == "opq":
+        # OPQ rotation learned for d_out // 8 sub-quantizers of 8 dims each, reducing to d_out
+        projection = faiss.OPQMatrix(d, d_out // 8, d_out)
+    else:
+        raise ValueError(f"Unknown projection method: {method}")
+
+    projection.train(sample)
+    return projection
+
+def save_projection(projection, path=PROJECTION_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    faiss.write_VectorTransform(projection, tmp_path)
+    os.replace(tmp_path, path)
+    print(f"Saved {projection.d_in} -> {projection.d_out} projection to {path}")
+
+# Function to get the saved projection, or None if it has not been trained
+def get_projection(path=PROJECTION_PATH):
+    global _projection, _projection_mtime
+    if not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    with _projection_lock:
+        if _projection is None or _projection_mtime != mtime:
+            _projection = faiss.read_VectorTransform(path)
+            _projection_mtime = mtime
+            print(f"Loaded {_projection.d_in} -> {_projection.d_out} projection from {path}")
+        return _projection
+
+def project(projection, vectors):
+    """Normalize, project and re-normalize vectors in float32 chunks."""
+    reduced = np.empty((len(vectors), projection.d_out), dtype=np.float32)
+    for start in range(0, len(vectors), CHUNK_SIZE):
+        reduced[start:start + CHUNK_SIZE] = projection.apply(normalize(vectors[start:start + CHUNK_SIZE]))
+    return reduced / np.linalg.norm(reduced, axis=1, keepdims=True)
+
+# Function to build the candidate index over the reduced vectors
+def build_reduced_index(projection, vectors):
+    index = faiss.IndexFlatIP(projection.d_out)
+    for start in range(0, len(vectors), CHUNK_SIZE):
+        index.add(project(projection, vectors[start:start + CHUNK_SIZE]))
+    return index
+
+def search_with_rerank(reduced_index, projection, vectors, queries, k, rerank_factor=RERANK_FACTOR):
+    """
+    Search the reduced index for k * rerank_factor candidates and re-rank them exactly.
+
+    Args:
+        vectors (np.ndarray): The full-precision, unit-normalized vectors the index was built from.
+        queries (np.ndarray): Unit-normalized full-precision queries.
+
+    Returns:
+        tuple: (similarity, ind) like faiss search, with cosine similarities on the full vectors.
+    """
+    n_candidates = min(k * rerank_factor, reduced_index.ntotal)
+    _, candidates = reduced_index.search(project(projection, queries), n_candidates)
+
+    # Exact cosine similarity between each query and its candidates
+    candidate_vectors = np.asarray(vectors[candidates], dtype=np.float32)
+    similarity = np.einsum("qcd,qd->qc", candidate_vectors, queries.astype(np.float32))
+
+    k = min(k, n_candidates)
+    order = np.argsort(-similarity, axis=1)[:, :k]
+    return np.take_along_axis(similarity, order, axis=1), np.take_along_axis(candidates, order, axis=1)
+
+# Function to measure how often the reduced search returns the same nearest neighbors as a full search
+def neighbor_recall(projection, vectors, n_queries=1000, k=5, seed=0):
+    vectors = normalize(vectors)
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)]
+
+    full_index = faiss.IndexFlatIP(vectors.shape[1])
+    full_index.add(vectors)
+    _, exact = full_index.search(queries, k)
+
+    _, approx = search_with_rerank(build_reduced_index(projection, vectors), projection, vectors, queries, k)
+    return float(np.mean([len(set(e) & set(a)) / k for e, a in zip(exact, approx)]))
+
+if __name__ == "__main__":
+    from ai.tech_stack.qdrant import retrieve_all_from_qdrant, VIDEO_COLLECTION_NAME
+
+    parser = argparse.ArgumentParser(description="Train the embedding search projection")
+    parser.add_argument("--dim", type=int, default=DEFAULT_REDUCED_DIM, choices=[256, 512])
+    parser.add_argument("--method", default="pca", choices=["pca", "opq"])
+    args = parser.parse_args()
+
+    catalog = retrieve_all_from_qdrant(VIDEO_COLLECTION_NAME)
+    projection = train_projection(catalog, args.dim, args.method)
+    print(f"Top-5 neighbor recall after re-ranking: {neighbor_recall(projection, catalog):.4f}")
+    save_projection(projection)
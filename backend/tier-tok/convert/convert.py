@@ -1,13 +1,41 @@
 import os
 import json
 import random
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
-from ai.tech_stack.aws import upload_single_to_s3 
+from ai.tech_stack.aws import upload_file_if_changed, save_s3_url_index, s3_object_url, VIDEO_PREFIX
 
 VIDEO_CONTENT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ai', 'video_content')
 SQL_OUTPUT_FILE = os.path.join(os.path.dirname(__file__), 'output.sql')
+CSV_OUTPUT_FILE = os.path.join(os.path.dirname(__file__), 'output.csv')
+MANIFEST_SUFFIX = '.manifest'
 TABLE_NAME = 'video_entity'
 
+# Column name -> python type every value is cast to before it is written
+COLUMN_TYPES = {
+    'video_id': str,
+    'caption': str,
+    'creator_id': int,
+    'duration': float,
+    'watch_time': float,
+    'video_url': str,
+    'past_months_view_count': int,
+    'total_view_count': int,
+    'like_count': int,
+    'comment_count': int,
+    'created_at': str,  # 'YYYY-MM-DD HH:MM:SS'
+}
+COLUMNS = list(COLUMN_TYPES)
+
+# Output formats: multi-row INSERT statements, or PostgreSQL COPY-format CSV
+INSERT_FORMAT = 'insert'
+COPY_FORMAT = 'copy'
+
+DEFAULT_WORKERS = 16
+DEFAULT_BATCH_SIZE = 500
+
 def get_random_watch_time(duration):
     if duration:
         return random.randint(int(duration * 0.5), int(duration))
@@ -27,21 +55,17 @@ def generate_unique_numbers(n=1000, start=1, end=1000):
         raise ValueError("n is larger than the range of numbers")
     return random.sample(range(start, end + 1), n)
 
-
-def main():
-    sql_lines = []
-
-    for category in os.listdir(VIDEO_CONTENT_DIR):
-        category_path = os.path.join(VIDEO_CONTENT_DIR, category)
+def iter_json_files(video_content_dir=VIDEO_CONTENT_DIR):
+    """Yield (json_path, video_dir, video_filename) for every metadata file, lazily."""
+    for category in os.listdir(video_content_dir):
+        category_path = os.path.join(video_content_dir, category)
         print(f"Processing category: {category}")
 
         if not os.path.isdir(category_path):
             continue
 
         json_dir = os.path.join(category_path, 'json_files')
-        print(f"json_dir: {json_dir}")
         video_dir = os.path.join(category_path, 'videos')
-        print(f"video_dir: {video_dir}")
 
         if not os.path.isdir(json_dir):
             print(f"[DEBUG] No json_files directory in: {category_path}")
@@ -51,65 +75,174 @@ def main():
             if not json_file.endswith('.json'):
                 continue
 
-            json_path = os.path.join(json_dir, json_file)
             base_name = os.path.splitext(json_file)[0]
             if base_name.endswith("_metadata"):
-                base_name = base_name[:-9] 
+                base_name = base_name[:-9]
             video_filename = base_name + "_video.mp4"
-            print(f"video_filename: {video_filename}")
-
-            # Skip if JSON file does not exist
-            if not os.path.exists(json_path):
-                print(f"[DEBUG] JSON file not found, skipping: {json_path}")
-                continue
-
-            # Try reading the JSON
-            try:
-                with open(json_path, 'r') as f:
-                    data = json.load(f)
-            except Exception as e:
-                print(f"[DEBUG] Error reading JSON {json_path}, skipping. Error: {e}")
-                continue
 
-            # Corresponding video file (assume mp4, same basename)
-            video_id, video_url = upload_single_to_s3(video_dir, video_filename)
-            caption = get_json_value(data.get('video_metadata', {}), 'description', '')
-            creator_id = generate_unique_numbers(1)[0]  # single unique number
-            print(f"Generated creator_id: {creator_id}")
-            duration = get_json_value(data.get('file_metadata', {}), 'duration', 0)
-            watch_time = float(get_json_value(data.get('video_metadata', {}), 'watch_time', None) or get_random_watch_time(duration))
-            pastmonthsviewcount = get_random_views()
-            totalviewcount = get_json_value(data.get('video_metadata', {}), 'playcount', get_random_views())
-            if pastmonthsviewcount < totalviewcount:
-                # If past month's views are less than total views, adjust accordingly
-                pastmonthsviewcount = int(totalviewcount * 0.75)
-            likecount = get_json_value(data.get('video_metadata', {}), 'diggcount', 0)
-            commentcount = get_json_value(data.get('video_metadata', {}), 'commentcount', 0)
-            createdat = get_json_value(data.get('video_metadata', {}), 'time_created', None)
-            if createdat:
+            yield os.path.join(json_dir, json_file), video_dir, video_filename
+
+def stable_video_id(video_dir, video_filename, video_content_dir=VIDEO_CONTENT_DIR):
+    # Same "<8 hex chars>_<filename>" shape as upload_single_to_s3, but derived from the file's path
+    # so a resumed run reuses the S3 key (and skips the upload) instead of creating a new object
+    relative_path = os.path.relpath(os.path.join(video_dir, video_filename), video_content_dir)
+    return f"{hashlib.sha1(relative_path.encode()).hexdigest()[:8]}_{video_filename}"
+
+def build_video_row(json_path, video_dir, video_filename):
+    """Read one metadata JSON, upload its video and return the row values in COLUMNS order."""
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+
+    # Corresponding video file (assume mp4, same basename); the index is saved once per batch
+    video_id = stable_video_id(video_dir, video_filename)
+    video_key = f"{VIDEO_PREFIX}{video_id}"
+    upload_file_if_changed(os.path.join(video_dir, video_filename), video_key, save_index=False)
+    video_url = s3_object_url(video_key)
+    caption = get_json_value(data.get('video_metadata', {}), 'description', '')
+    creator_id = generate_unique_numbers(1)[0]  # single unique number
+    duration = get_json_value(data.get('file_metadata', {}), 'duration', 0)
+    watch_time = float(get_json_value(data.get('video_metadata', {}), 'watch_time', None) or get_random_watch_time(duration))
+    pastmonthsviewcount = get_random_views()
+    totalviewcount = get_json_value(data.get('video_metadata', {}), 'playcount', get_random_views())
+    if pastmonthsviewcount < totalviewcount:
+        # If past month's views are less than total views, adjust accordingly
+        pastmonthsviewcount = int(totalviewcount * 0.75)
+    likecount = get_json_value(data.get('video_metadata', {}), 'diggcount', 0)
+    commentcount = get_json_value(data.get('video_metadata', {}), 'commentcount', 0)
+    createdat = get_json_value(data.get('video_metadata', {}), 'time_created', None)
+    if createdat:
+        try:
+            createdat = datetime.fromtimestamp(int(createdat)).strftime('%Y-%m-%d %H:%M:%S')
+        except Exception:
+            createdat = str(createdat)
+    else:
+        createdat = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    return typed_row((video_id, caption, creator_id, duration, watch_time, video_url,
+                      pastmonthsviewcount, totalviewcount, likecount, commentcount, createdat))
+
+def typed_row(values):
+    """Cast values to COLUMN_TYPES so numbers from JSON strings are not written as text."""
+    return tuple(
+        None if value is None else (int(float(value)) if cast is int else cast(value))
+        for value, cast in zip(values, COLUMN_TYPES.values())
+    )
+
+def esc(val):
+    if val is None:
+        return "NULL"
+    if isinstance(val, str):
+        return "'" + val.replace("'", "''") + "'"
+    return str(val)
+
+def format_insert_batch(rows):
+    values = ",\n".join("(" + ", ".join(esc(v) for v in row) + ")" for row in rows)
+    return f"INSERT INTO {TABLE_NAME} ({', '.join(COLUMNS)}) VALUES\n{values};\n"
+
+def copy_field(val):
+    # Unquoted empty field is NULL in COPY CSV; strings are always quoted so '' stays an empty string
+    if val is None:
+        return ''
+    if isinstance(val, str):
+        return '"' + val.replace('"', '""') + '"'
+    return str(val)
+
+def format_copy_batch(rows):
+    return "".join(",".join(copy_field(v) for v in row) + "\n" for row in rows)
+
+def copy_command(csv_path):
+    """psql meta-command that bulk loads a COPY-format CSV written by this script."""
+    return f"\\copy {TABLE_NAME} ({', '.join(COLUMNS)}) FROM '{os.path.abspath(csv_path)}' WITH (FORMAT csv)"
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return set()
+    with open(manifest_path, 'r') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+def main(output_file=None, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE, fresh=False, output_format=INSERT_FORMAT):
+    """
+    Upload videos and write seed data as a streaming pipeline.
+
+    JSON parsing and S3 uploads run concurrently in a thread pool while the main thread
+    writes completed rows in batches, either as multi-row INSERT statements or as
+    COPY-format CSV (load it with the psql command printed at the end). After each batch
+    is flushed its JSON files are appended to <output_file>.manifest, so an interrupted
+    run resumes where it left off (use fresh=True to start over). S3 keys are derived from
+    each video's path, so videos uploaded by an interrupted batch are skipped, not re-uploaded.
+    """
+    if output_format not in (INSERT_FORMAT, COPY_FORMAT):
+        raise ValueError(f"Unknown output format: {output_format}")
+    format_batch = format_copy_batch if output_format == COPY_FORMAT else format_insert_batch
+    output_file = output_file or (CSV_OUTPUT_FILE if output_format == COPY_FORMAT else SQL_OUTPUT_FILE)
+
+    manifest_path = output_file + MANIFEST_SUFFIX
+    if fresh:
+        for path in (output_file, manifest_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    completed = load_manifest(manifest_path)
+    if completed:
+        print(f"Resuming: {len(completed)} files already converted")
+
+    batch_rows, batch_paths = [], []
+    written = 0
+
+    with open(output_file, 'a', encoding='utf-8', newline='') as sql_out, open(manifest_path, 'a') as manifest_out, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+
+        def flush_batch():
+            nonlocal written
+            if not batch_rows:
+                return
+            sql_out.write(format_batch(batch_rows))
+            sql_out.flush()
+            os.fsync(sql_out.fileno())
+            # Only mark files done once their rows are durably in the output
+            save_s3_url_index()
+            manifest_out.write("".join(path + "\n" for path in batch_paths))
+            manifest_out.flush()
+            written += len(batch_rows)
+            print(f"[DEBUG] Wrote batch of {len(batch_rows)} rows ({written} total)")
+            batch_rows.clear()
+            batch_paths.clear()
+
+        def collect(future_to_path, done):
+            for future in done:
+                json_path = future_to_path.pop(future)
                 try:
-                    createdat = datetime.fromtimestamp(int(createdat)).strftime('%Y-%m-%d %H:%M:%S')
-                except Exception:
-                    createdat = str(createdat)
-            else:
-                createdat = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-            def esc(val):
-                if isinstance(val, str):
-                    return val.replace("'", "''")
-                return val
-
-            sql = f"INSERT INTO {TABLE_NAME} (video_id, caption, creator_id, duration, watch_time, video_url, past_months_view_count, total_view_count, like_count, comment_count, created_at) VALUES \
-('{esc(str(video_id))}', '{esc(caption)}', {esc(int(creator_id))}, {float(duration)}, {watch_time}, '{esc(video_url)}', {pastmonthsviewcount}, {totalviewcount}, {likecount}, {commentcount}, '{esc(createdat)}');"
-
-            sql_lines.append(sql)
-            print(f"[DEBUG] Added SQL for {json_file}")
+                    batch_rows.append(future.result())
+                    batch_paths.append(json_path)
+                except Exception as e:
+                    print(f"[DEBUG] Error converting {json_path}, skipping. Error: {e}")
+                if len(batch_rows) >= batch_size:
+                    flush_batch()
+
+        # Keep a bounded number of files in flight so memory stays constant
+        future_to_path = {}
+        for json_path, video_dir, video_filename in iter_json_files():
+            if json_path in completed:
+                continue
+            future_to_path[executor.submit(build_video_row, json_path, video_dir, video_filename)] = json_path
+            if len(future_to_path) >= workers * 2:
+                done, _ = wait(future_to_path, return_when=FIRST_COMPLETED)
+                collect(future_to_path, done)
 
-    # Write all SQL lines to output file
-    with open(SQL_OUTPUT_FILE, 'w') as f:
-        f.write("\n".join(sql_lines))
+        collect(future_to_path, wait(future_to_path).done)
+        flush_batch()
 
-    print(f"SQL output written to {SQL_OUTPUT_FILE}")
+    print(f"Output written to {output_file} ({written} new rows)")
+    if output_format == COPY_FORMAT:
+        print(f"Load it with: psql <database-url> -c \"{copy_command(output_file)}\"")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Upload videos to S3 and generate video_entity seed SQL")
+    parser.add_argument("--output", default=None, help="defaults to output.sql, or output.csv with --format copy")
+    parser.add_argument("--format", choices=[INSERT_FORMAT, COPY_FORMAT], default=INSERT_FORMAT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--fresh", action="store_true", help="ignore the manifest and start over")
+    args = parser.parse_args()
+
+    main(args.output, args.workers, args.batch_size, args.fresh, args.format)
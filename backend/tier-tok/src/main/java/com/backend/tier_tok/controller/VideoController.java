@@ -1,5 +1,6 @@
 package com.backend.tier_tok.controller;
 
+import com.backend.tier_tok.model.DTO.CreatorBotFlagDTO;
 import com.backend.tier_tok.model.DTO.ProfitPoolDistributionResponseDTO;
 import com.backend.tier_tok.model.entity.SuspiciousBotEntity;
 import com.backend.tier_tok.model.entity.SuspiciousCreatorBotEntity;
@@ -91,4 +92,10 @@ public class VideoController {
         interactionService.handleGetCreatorBotsFlag(videoId, similarityScore);
         return ResponseEntity.ok(null);
     }
-}
\ No newline at end of file
+
+    @PostMapping("/receive-creator-bots/batch")
+    public ResponseEntity<Void> getCreatorBotsFlagBatch(@RequestBody List<CreatorBotFlagDTO> flags) {
+        interactionService.handleGetCreatorBotsFlagBatch(flags);
+        return ResponseEntity.ok(null);
+    }
+}
@@ -0,0 +1,16 @@
+package com.backend.tier_tok.model.DTO;
+
+import lombok.AllArgsConstructor;
+import lombok.Builder;
+import lombok.Data;
+import lombok.NoArgsConstructor;
+
+@Data
+@NoArgsConstructor
+@AllArgsConstructor
+@Builder
+public class CreatorBotFlagDTO {
+    private String videoId;
+
+    private double similarityScore;
+}
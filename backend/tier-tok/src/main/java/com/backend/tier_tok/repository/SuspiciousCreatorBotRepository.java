@@ -3,5 +3,9 @@ package com.backend.tier_tok.repository;
 import com.backend.tier_tok.model.entity.SuspiciousCreatorBotEntity;
 import org.springframework.data.jpa.repository.JpaRepository;
 
+import java.util.Collection;
+import java.util.List;
+
 public interface SuspiciousCreatorBotRepository extends JpaRepository<SuspiciousCreatorBotEntity, Long> {
+    List<SuspiciousCreatorBotEntity> findByVideoIdIn(Collection<String> videoIds);
 }
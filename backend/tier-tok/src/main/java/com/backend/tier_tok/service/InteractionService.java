@@ -1,5 +1,6 @@
 package com.backend.tier_tok.service;
 
+import com.backend.tier_tok.model.DTO.CreatorBotFlagDTO;
 import com.backend.tier_tok.model.DTO.InteractionEventRequestDTO;
 import com.backend.tier_tok.model.entity.SuspiciousBotEntity;
 import com.backend.tier_tok.model.entity.SuspiciousCreatorBotEntity;
@@ -25,6 +26,7 @@ import org.springframework.http.HttpHeaders;
 import java.time.LocalDateTime;
 import java.time.temporal.ChronoUnit;
 import java.util.*;
+import java.util.stream.Collectors;
 
 @Service
 @Slf4j
@@ -221,4 +223,24 @@ public class InteractionService {
 
         suspiciousCreatorBotRepository.save(suspiciousCreatorBot);
     }
+
+    // Idempotent: the AI server's outbox may redeliver a batch, so videos already flagged are skipped
+    @Transactional
+    public void handleGetCreatorBotsFlagBatch(List<CreatorBotFlagDTO> flags) {
+        Set<String> alreadyFlagged = suspiciousCreatorBotRepository.findByVideoIdIn(
+                        flags.stream().map(CreatorBotFlagDTO::getVideoId).toList()
+                ).stream()
+                .map(SuspiciousCreatorBotEntity::getVideoId)
+                .collect(Collectors.toSet());
+
+        List<SuspiciousCreatorBotEntity> suspiciousCreatorBots = flags.stream()
+                .filter(flag -> alreadyFlagged.add(flag.getVideoId()))
+                .map(flag -> SuspiciousCreatorBotEntity.builder()
+                        .videoId(flag.getVideoId())
+                        .similarityScore(flag.getSimilarityScore())
+                        .build())
+                .toList();
+
+        suspiciousCreatorBotRepository.saveAll(suspiciousCreatorBots);
+    }
 }